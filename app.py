@@ -1,19 +1,29 @@
+import time
+RUN_T0 = time.perf_counter()  # Début du run : mesure du premier affichage (cf. BUDGET DE DEMARRAGE)
+
 import streamlit as st
 import streamlit.components.v1 as components
-import requests
-import pandas as pd
-import plotly.graph_objects as go
 from urllib.parse import quote
-from collections import Counter
-import concurrent.futures
-import threading
 import html
-import time
+import json
 import os
+import logging
+
+from engine import (
+    MATCH_COUNT, QUEUE_MAP, REPORT_CACHE_MAX, AccountNotFound, NoGamesFound, LRUCache,
+    analyze, determine_playstyle, prefetch_duo
+)
+from assets import champion_icon, current_dd_version, resolve_champion
+import metrics
+
+# pandas n'est importé que pour le panneau debug
 
 # --- CONFIGURATION ---
 st.set_page_config(page_title="LoL Duo Analyst V79 (Stable & Safe)", layout="wide")
 
+# Endpoint Prometheus /metrics si METRICS_PORT est défini (démarré une fois par process)
+metrics.serve()
+
 # --- API KEY ---
 try:
     API_KEY = st.secrets["RIOT_API_KEY"]
@@ -25,172 +35,29 @@ if not API_KEY:
     st.stop()
 
 # --- ASSETS & CONSTANTES ---
-BACKGROUND_IMAGE_URL = "https://media.discordapp.net/attachments/1065027576572518490/1179469739770630164/face_tiled.jpg?ex=657a90f2&is=65681bf2&hm=123"
-
-# --- PARAMETRES DE SECURITE (SAFE MODE) ---
-MATCH_COUNT = 10   # Réduit de 15 à 10 pour économiser les requêtes
-MAX_WORKERS = 4    # Réduit de 8 à 4 pour éviter le "Rate Limit" instantané
-
-QUEUE_MAP = {
-    "Ranked Solo/Duo": 420,
-    "Ranked Flex": 440,
-    "Draft Normal": 400,
-    "ARAM": 450,
-    "Arena": 1700
-}
+DEPTH_OPTIONS = [MATCH_COUNT, 100, 250, 500]  # Au-delà de MATCH_COUNT : historique profond paginé, arrêt anticipé
 
 ROLE_ICONS = {
     "TOP": "🛡️ TOP", "JUNGLE": "🌲 JUNGLE", "MIDDLE": "🧙 MID", 
     "BOTTOM": "🏹 ADC", "UTILITY": "🩹 SUPP", "UNKNOWN": "❓ FILL"
 }
 
-# --- TRADUCTIONS ---
-TRANSLATIONS = {
-    "FR": {
-        "title": "LoL Duo Analyst",
-        "btn_scan": "LANCER L'ANALYSE",
-        "placeholder": "Exemple: Kameto#EUW",
-        "label_id": "Riot ID", "lbl_region": "RÉGION", "lbl_mode": "MODE", "dpm_btn": "🔗 Voir sur dpm.lol",
-        "btn_profile": "Voir Profil DPM",
-        "lbl_duo_detected": "🚨 DUO DÉTECTÉ AVEC {duo} 🚨",
-        
-        "v_hyper": "CARRY MACHINE", "s_hyper": "{target} inflige des dégâts monstrueux comparé à {duo}",
-        "v_survivor": "IMMORTEL", "s_survivor": "{target} survit et joue propre, {duo} meurt trop souvent",
-        "v_tactician": "MASTERMIND", "s_tactician": "{target} gagne grâce à la vision et au map control",
-        "v_breacher": "DESTRUCTEUR", "s_breacher": "{target} prend les tours, {duo} regarde",
-        "v_solid": "DUO FUSIONNEL", "s_solid": "Synergie parfaite entre {target} et {duo}",
-        
-        "v_passenger": "PASSAGER", "s_passenger": "{target} se laisse porter par {duo} (Dégâts faibles)",
-        "v_feeder": "ZONE DE DANGER", "s_feeder": "{target} passe trop de temps à l'écran gris vs {duo}",
-        "v_struggle": "EN DIFFICULTÉ", "s_struggle": "{target} peine à suivre le rythme de {duo}",
-
-        "solo": "LOUP SOLITAIRE", "solo_sub": "Aucun duo récurrent détecté sur 10 parties.",
-        "loading": "Analyse tactique en cours...",
-        
-        "q_surv": "Injouable (KDA)", "q_dmg": "Gros Dégâts", "q_obj": "Destructeur", "q_vis": "Contrôle Map",
-        "f_feed": "Meurt trop souvent", "f_blind": "Vision faible", "f_afk": "Dégâts faibles",
-        "error_no_games": "Aucune partie trouvée.", "error_hint": "Vérifie la région ou le mode de jeu."
-    },
-    "EN": {
-        "title": "LoL Duo Analyst", "btn_scan": "START ANALYSIS", "placeholder": "Example: Faker#KR1",
-        "label_id": "Riot ID", "lbl_region": "REGION", "lbl_mode": "MODE", "dpm_btn": "🔗 Check dpm.lol",
-        "btn_profile": "DPM Profile",
-        "lbl_duo_detected": "🚨 DUO DETECTED WITH {duo} 🚨",
-        
-        "v_hyper": "DMG CARRY", "s_hyper": "{target} is dealing massive damage compared to {duo}",
-        "v_survivor": "IMMORTAL", "s_survivor": "{target} survives, {duo} dies too much",
-        "v_tactician": "MASTERMIND", "s_tactician": "{target} wins via vision & macro",
-        "v_breacher": "BREACHER", "s_breacher": "{target} takes towers, {duo} watches",
-        "v_solid": "PERFECT DUO", "s_solid": "Perfect synergy between {target} and {duo}",
-        
-        "v_passenger": "PASSENGER", "s_passenger": "{target} is getting carried by {duo} (Low Dmg)",
-        "v_feeder": "DANGER ZONE", "s_feeder": "{target} sees grey screen too often vs {duo}",
-        "v_struggle": "STRUGGLING", "s_struggle": "{target} can't keep up with {duo}",
-
-        "solo": "SOLO PLAYER", "solo_sub": "No recurring partner found.",
-        "loading": "Analyzing...", "q_surv": "Unkillable", "q_dmg": "Heavy Hitter", "q_obj": "Destroyer", "q_vis": "Map Control",
-        "f_feed": "Too fragile", "f_blind": "Blind", "f_afk": "Low Dmg", "error_no_games": "No games found.", "error_hint": "Check Region."
-    },
-    "ES": {"title":"Analista LoL","btn_scan":"ANALIZAR","placeholder":"Ejemplo: Ibai#EUW","label_id":"Riot ID","lbl_region":"REGIÓN","lbl_mode":"MODO","dpm_btn":"Ver dpm.lol","btn_profile":"Perfil DPM","lbl_duo_detected":"🚨 DUO DETECTADO CON {duo} 🚨","v_hyper":"MVP TOTAL","s_hyper":"Domina a {duo}","v_tactician":"ESTRATEGA","s_tactician":"Macro para {duo}","v_fighter":"GLADIADOR","s_fighter":"Daño","v_solid":"DUO SOLIDO","s_solid":"Sinergia con {duo}","v_passive":"PASIVO","s_passive":"Seguro","v_struggle":"DIFICULTAD","s_struggle":"Sufre vs {duo}","solo":"SOLO","solo_sub":"Sin duo","loading":"Cargando...","role_hyper":"CARRY","role_lead":"LIDER","role_equal":"SOCIO","role_supp":"APOYO","role_gap":"NOVATO","q_surv":"Inmortal","q_dmg":"Daño","q_obj":"Torres","q_vis":"Vision","q_bal":"Balance","q_supp":"Support","f_feed":"Muere","f_afk":"Poco daño","f_no_obj":"Sin obj","f_blind":"Ciego","f_farm":"Farm","f_ok":"Bien","stats":"STATS","combat":"COMBATE","eco":"ECONOMIA","vision":"VISION","error_no_games":"Error","error_hint":"Region?","v_survivor":"INMORTAL","s_survivor":"{target} sobrevive","v_breacher":"DESTRUCTOR","s_breacher":"Torres","v_passenger":"PASAJERO","s_passenger":"Carreado","v_feeder":"FEEDER","s_feeder":"Muere mucho"},
-    "KR": {"title":"LoL 듀오 분석","btn_scan":"분석 시작","placeholder":"예: Hide on bush#KR1","label_id":"Riot ID","lbl_region":"지역","lbl_mode":"모드","dpm_btn":"dpm.lol 확인","btn_profile":"DPM 프로필","lbl_duo_detected":"🚨 {duo} 와 듀오 감지 🚨","v_hyper":"하드 캐리","s_hyper":"{target} > {duo}","v_tactician":"전략가","s_tactician":"운영","v_fighter":"전투광","s_fighter":"딜","v_solid":"완벽 듀오","s_solid":"{target} & {duo}","v_passive":"버스","s_passive":"안전","v_struggle":"고전","s_struggle":"역부족","solo":"솔로","solo_sub":"듀오 없음","loading":"분석 중...","role_hyper":"캐리","role_lead":"리더","role_equal":"파트너","role_supp":"서포터","role_gap":"신입","q_surv":"생존","q_dmg":"딜량","q_obj":"철거","q_vis":"시야","q_bal":"밸런스","q_supp":"서폿","f_feed":"데스","f_afk":"딜부족","f_no_obj":"운영부족","f_blind":"시야부족","f_farm":"CS","f_ok":"굿","stats":"통계","combat":"전투","eco":"경제","vision":"시야","error_no_games":"없음","error_hint":"지역?","v_survivor":"불사신","s_survivor":"생존왕","v_breacher":"철거반","s_breacher":"타워","v_passenger":"탑승","s_passenger":"버스탐","v_feeder":"위험","s_feeder":"데스 많음"}
-}
-
 # --- MAP DRAPEAUX ---
 LANG_MAP = {"🇫🇷 FR": "FR", "🇺🇸 EN": "EN", "🇪🇸 ES": "ES", "🇰🇷 KR": "KR"}
 
-# --- CSS MODERNE ---
-st.markdown(f"""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;600;900&display=swap');
-    html, body, [class*="css"] {{ font-family: 'Inter', sans-serif; }}
-    
-    .stApp {{
-        background-image: url("{BACKGROUND_IMAGE_URL}");
-        background-size: 150px; background-repeat: repeat; background-attachment: fixed;
-    }}
-    
-    .block-container {{
-        max-width: 1400px !important; 
-        padding-top: 3rem !important; padding-bottom: 3rem !important;
-        background: rgba(12, 12, 12, 0.95); backdrop-filter: blur(15px);
-        border-radius: 15px; border: 1px solid #333; box-shadow: 0 20px 50px rgba(0,0,0,0.9);
-        margin-top: 20px !important;
-    }}
-
-    .main-title {{
-        font-size: 55px; font-weight: 900; text-align: center; margin-bottom: 30px; margin-top: 10px;
-        background: linear-gradient(90deg, #00c6ff, #0072ff);
-        -webkit-background-clip: text; -webkit-text-fill-color: transparent;
-        filter: drop-shadow(0 0 10px rgba(0, 114, 255, 0.5)); text-transform: uppercase;
-    }}
-    
-    .player-card {{
-        background: rgba(30, 30, 30, 0.5); border-radius: 16px; padding: 25px;
-        border: 1px solid rgba(255,255,255,0.08); text-align: center; height: 100%;
-        box-shadow: inset 0 0 20px rgba(0,0,0,0.2);
-    }}
-    .player-name {{ font-size: 28px; font-weight: 800; color: white; margin-bottom: 5px; word-break: break-all; }}
-    .player-sub {{ font-size: 14px; color: #aaa; font-weight: 600; letter-spacing: 1px; text-transform: uppercase; }}
-
-    .badge {{
-        display: inline-block; padding: 4px 8px; border-radius: 4px; 
-        font-size: 11px; font-weight: 700; margin: 2px; text-transform: uppercase;
-    }}
-    .b-green {{ background: rgba(0, 255, 153, 0.15); color: #00ff99; border: 1px solid #00ff99; }}
-    .b-red {{ background: rgba(255, 68, 68, 0.15); color: #ff6666; border: 1px solid #ff4444; }}
-    .b-blue {{ background: rgba(0, 191, 255, 0.15); color: #00BFFF; border: 1px solid #00BFFF; }}
-    .b-gold {{ background: rgba(255, 215, 0, 0.15); color: #FFD700; border: 1px solid #FFD700; }}
-
-    .stat-grid {{ display: grid; grid-template-columns: 1fr 1fr; gap: 15px; margin-top: 20px; }}
-    .stat-item {{ background: rgba(0,0,0,0.3); padding: 12px; border-radius: 10px; text-align: left; border: 1px solid rgba(255,255,255,0.05); }}
-    .stat-val-container {{ display: flex; align-items: center; gap: 8px; }}
-    .stat-val {{ font-size: 20px; font-weight: 700; color: white; }}
-    .stat-lbl {{ font-size: 11px; color: #999; text-transform: uppercase; margin-top: 4px; font-weight: 600; letter-spacing: 0.5px; }}
-    
-    .stat-diff {{ font-size: 12px; font-weight: 700; padding: 2px 5px; border-radius: 4px; }}
-    .pos {{ color: #00ff99; background: rgba(0,255,153,0.15); }} 
-    .neg {{ color: #ff4444; background: rgba(255,68,68,0.15); }}
-    .neutral {{ color: #888; }}
-
-    .verdict-box {{
-        text-align: center; padding: 30px; border-radius: 16px; margin: 20px 0 40px 0;
-        background: rgba(20, 20, 20, 0.8); border: 2px solid #333;
-    }}
-    
-    /* STYLE BOUTON DPM */
-    .dpm-btn {{
-        background: #2563eb; /* Bleu vif */
-        color: white !important;
-        padding: 6px 16px;
-        border-radius: 20px; /* Arrondi pilule */
-        text-decoration: none;
-        font-size: 12px;
-        font-weight: 700;
-        display: inline-block;
-        margin-bottom: 8px;
-        transition: 0.2s;
-        box-shadow: 0 4px 10px rgba(37, 99, 235, 0.3);
-    }}
-    .dpm-btn:hover {{
-        background: #1d4ed8;
-        transform: translateY(-2px);
-    }}
-    .dpm-btn-header {{ 
-        background: rgba(37, 99, 235, 0.2); color: #60a5fa !important; padding: 5px 10px;
-        border-radius: 6px; text-decoration: none; font-size: 12px; border: 1px solid #2563eb;
-    }}
-
-    .stButton > button {{
-        width: 100%; height: 55px; background: linear-gradient(135deg, #ff0055, #cc0044);
-        color: white; font-size: 20px; font-weight: 800; border: none; border-radius: 10px;
-        text-transform: uppercase; transition: 0.3s;
-    }}
-    .stButton > button:hover {{ transform: translateY(-2px); box-shadow: 0 5px 25px rgba(255,0,60,0.5); }}
-    
-    .stTextInput > label {{ display: none; }}
-    .stForm > div[data-testid="stFormEnterToSubmit"] {{ display: none; }}
-</style>
-""", unsafe_allow_html=True)
+# --- CSS & TRADUCTIONS (ui/) ---
+UI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ui")
+
+@st.cache_resource
+def load_static():
+    """(balise <style>, traductions) : lus une fois par process, le script est réexécuté à chaque interaction."""
+    with open(os.path.join(UI_DIR, "style.css"), encoding="utf-8") as f:
+        css = f"<style>\n{f.read()}</style>"
+    with open(os.path.join(UI_DIR, "translations.json"), encoding="utf-8") as f:
+        return css, json.load(f)
+
+CSS, TRANSLATIONS = load_static()
+st.markdown(CSS, unsafe_allow_html=True)
 
 # --- HEADER & LANGUAGE ---
 c_title, c_lang = st.columns([5, 1])
@@ -203,7 +70,7 @@ st.markdown(f'<div class="main-title">{T["title"]}</div>', unsafe_allow_html=Tru
 
 # --- FORMULAIRE ---
 with st.form("search_form"):
-    c1, c2, c3 = st.columns([3, 1, 1], gap="small")
+    c1, c2, c3, c4 = st.columns([3, 1, 1, 1], gap="small")
     with c1:
         st.markdown(f"""
         <div style="display:flex; justify-content:space-between; align-items:center; margin-bottom:5px;">
@@ -217,29 +84,40 @@ with st.form("search_form"):
     with c3:
         st.markdown(f"<span style='font-size:14px; font-weight:700; color:#ddd;'>{T['lbl_mode']}</span>", unsafe_allow_html=True)
         queue_label = st.selectbox("ModeLabel", list(QUEUE_MAP.keys()), label_visibility="collapsed")
+    with c4:
+        st.markdown(f"<span style='font-size:14px; font-weight:700; color:#ddd;'>{T['lbl_depth']}</span>", unsafe_allow_html=True)
+        depth = st.selectbox("DepthLabel", DEPTH_OPTIONS, label_visibility="collapsed")
     
     st.markdown("<br>", unsafe_allow_html=True)
     submitted = st.form_submit_button(T["btn_scan"])
 
-# --- HELPERS & API ROBUSTE ---
-@st.cache_data(ttl=3600)
-def get_dd_version():
-    try: 
-        resp = requests.get("https://ddragon.leagueoflegends.com/api/versions.json", timeout=5)
-        if resp.status_code == 200: return resp.json()[0]
-    except: pass
-    return "14.23.1"
-
-DD_VERSION = get_dd_version()
-
-def get_champ_url(champ_name):
-    if not champ_name: return "https://ddragon.leagueoflegends.com/cdn/img/champion/splash/Poro_0.jpg"
-    clean = str(champ_name).replace(" ", "").replace("'", "").replace(".", "")
-    mapping = {"wukong": "MonkeyKing", "renataglasc": "Renata", "nunu&willump": "Nunu", "kogmaw": "KogMaw", "reksai": "RekSai", "drmundo": "DrMundo", "belveth": "Belveth"}
-    return f"https://ddragon.leagueoflegends.com/cdn/{DD_VERSION}/img/champion/{mapping.get(clean.lower(), clean)}.png"
-
-def safe_format(text, target, duo):
-    try: return text.format(target=html.escape(str(target)), duo=html.escape(str(duo)))
+# --- BUDGET DE DEMARRAGE ---
+STARTUP_BUDGET = float(os.environ.get("STARTUP_BUDGET", "1.5"))  # (s) Premier affichage du formulaire, process à froid
+
+@st.cache_resource
+def process_runs():
+    return {"n": 0}
+
+runs = process_runs()
+startup_phase = "cold" if runs["n"] == 0 else "rerun"
+runs["n"] += 1
+startup_s = time.perf_counter() - RUN_T0
+metrics.observe("startup", startup_s, phase=startup_phase)
+if startup_phase == "cold" and startup_s > STARTUP_BUDGET:
+    metrics.incr("startup_over_budget_total")
+    logging.getLogger("boostlol").warning("Démarrage à froid en %.2fs (budget %.2fs)", startup_s, STARTUP_BUDGET)
+# Version Data Dragon : celle persistée tout de suite, rafraîchie en arrière-plan si périmée (jamais d'attente du CDN ici)
+current_dd_version()
+
+# --- HELPERS ---
+def get_champ_url(champ_name, champ_key=None):
+    # Icône du miroir local en data-URI : aucune requête vers le CDN au rendu
+    return champion_icon(current_dd_version(), champ_key, champ_name)
+
+def safe_format(text, target, duo, escape=True):
+    # escape=False : texte inséré par textContent dans le composant duo_view, pas en HTML
+    if escape: target, duo = html.escape(str(target)), html.escape(str(duo))
+    try: return text.format(target=target, duo=duo)
     except: return text
 
 def get_dpm_url(riot_id_str):
@@ -254,300 +132,134 @@ def get_dpm_url(riot_id_str):
     except:
         return "https://dpm.lol"
 
-# LOGIQUE SCORE
-def determine_playstyle(stats, role, lang_dict):
-    badges = []
-    kda = stats.get('kda', 0)
-    vis = stats.get('vis_min', 0)
-    kp = stats.get('kp', 0)
-    dmg = stats.get('dmg_min', 0)
-    obj = stats.get('obj', 0)
-    sk = stats.get('solokills', 0)
-
-    if kda >= 4.0: badges.append((lang_dict.get("q_surv", "Survival"), "b-gold"))
-    if vis >= 2.0 or (role == "UTILITY" and vis >= 2.5): badges.append((lang_dict.get("q_vis", "Oracle"), "b-blue")) 
-    if kp >= 0.65: badges.append(("Teamplayer", "b-green"))
-    if dmg >= 800: badges.append((lang_dict.get("q_dmg", "Damage"), "b-red"))
-    if sk >= 2.5: badges.append(("Duelist", "b-red"))
-    if obj >= 5000: badges.append((lang_dict.get("q_obj", "Breacher"), "b-gold"))
-    
-    if kda < 1.5: badges.append((lang_dict.get("f_feed", "Grey Screen"), "b-red"))
-    if vis < 0.4 and role != "ADC": badges.append((lang_dict.get("f_blind", "Blind"), "b-red"))
-    if dmg < 300 and role not in ["UTILITY", "JUNGLE"]: badges.append((lang_dict.get("f_afk", "AFK"), "b-blue"))
-
-    if not badges: badges.append(("Standard", "b-blue"))
-    return badges[:3] 
-
-def create_radar(data_list, names, colors, title=None):
-    categories = ['Combat', 'Gold', 'Vision', 'Objectifs', 'Survie']
-    fig = go.Figure()
-    for i, data in enumerate(data_list):
-        safe_name = html.escape(str(names[i]))
-        fig.add_trace(go.Scatterpolar(r=data, theta=categories, fill='toself', name=safe_name, line_color=colors[i], opacity=0.7, marker=dict(size=5)))
-    fig.update_layout(
-        polar=dict(bgcolor='rgba(0,0,0,0)', radialaxis=dict(visible=True, range=[0, 100], showticklabels=False, linecolor='#555', gridcolor='#444'), angularaxis=dict(linecolor='#555', gridcolor='#444', tickfont=dict(color='#eee'))),
-        showlegend=True, legend=dict(font=dict(color='white'), orientation="h", y=-0.15, x=0.5, xanchor="center", bgcolor='rgba(0,0,0,0)'),
-        paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', margin=dict(l=60, r=60, t=20, b=60), height=400
-    )
-    return fig
-
-# --- API CORE (AVEC RETRY ROBUSTE) ---
-def safe_request(url):
-    retries = 3
-    for i in range(retries):
-        try:
-            resp = requests.get(url, timeout=5)
-            if resp.status_code == 200:
-                return resp
-            elif resp.status_code == 429: # RATE LIMIT
-                wait = int(resp.headers.get("Retry-After", 2))
-                time.sleep(wait)
-                continue
-            elif resp.status_code == 403: # FORBIDDEN (API KEY EXPIRED)
-                return None
-            else:
-                return None
-        except:
-            time.sleep(1)
-            continue
-    return None
-
-@st.cache_data(ttl=600)
-def get_puuid(name, tag, region, api_key):
-    return safe_request(f"https://{region}.api.riotgames.com/riot/account/v1/accounts/by-riot-id/{name}/{tag}?api_key={api_key}")
-
-@st.cache_data(ttl=3600)
-def get_account_by_puuid(puuid, region, api_key):
-    r = safe_request(f"https://{region}.api.riotgames.com/riot/account/v1/accounts/by-puuid/{puuid}?api_key={api_key}")
-    return r.json() if r else None
-
-@st.cache_data(ttl=120)
-def get_matches(puuid, region, api_key, q_id):
-    # ICI ON UTILISE LE PARAMETRE MATCH_COUNT (10)
-    return safe_request(f"https://{region}.api.riotgames.com/lol/match/v5/matches/by-puuid/{puuid}/ids?queue={q_id}&start=0&count={MATCH_COUNT}&api_key={api_key}")
-
-def fetch_match(m_id, region, api_key):
-    r = safe_request(f"https://{region}.api.riotgames.com/lol/match/v5/matches/{m_id}?api_key={api_key}")
-    return r.json() if r else {}
+# --- RENDU RESULTAT ---
+PROGRESS_INTERVAL = 0.4  # Délai mini (s) entre deux rendus provisoires
+RADAR_AXES = ['Combat', 'Gold', 'Vision', 'Objectifs', 'Survie']
+CARD_STATS = ("kda", "kp", "dmg_min", "vis_min", "obj", "gold_min")
+
+# Verdict, radar (SVG) et cartes rendus dans le navigateur à partir d'une vue JSON (ui/duo_view/index.html)
+duo_component = components.declare_component("duo_view", path=os.path.join(UI_DIR, "duo_view"))
+
+@st.cache_resource
+def render_cache():
+    # Partagé entre sessions et reruns : un script Streamlit est réexécuté à chaque interaction
+    return LRUCache(REPORT_CACHE_MAX)
+
+def duo_view(report):
+    """Vue JSON compacte d'un DuoReport dans la langue courante : textes traduits, badges, stats brutes, radar.
+
+    La mise en forme (cartes, écarts en %, radar) est faite par le composant ; "icons" associe
+    "<version DD>/<image>" à la data-URI de chaque champion affiché.
+    """
+    version = current_dd_version()
+    icons = {}
+
+    def champs(names, keys):
+        out = []
+        for name, key in zip(names, keys or [None] * len(names)):
+            champ = resolve_champion(version, key, name)
+            icon = f"{version}/{champ['image']}" if champ else None
+            if icon: icons[icon] = get_champ_url(name, key)
+            out.append({"name": name, "icon": icon})
+        return out
+
+    def player(name, full_id, role, avg, diff, color, champ_names, champ_keys):
+        return {"name": name, "url": get_dpm_url(full_id), "role": ROLE_ICONS.get(role, "UNK"), "color": color,
+                "badges": determine_playstyle(avg, role, T, report.queue), "champs": champs(champ_names, champ_keys),
+                "stats": {k: round(avg.get(k, 0), 3) for k in CARD_STATS}, "diff": {k: round(diff.get(k, 0), 3) for k in CARD_STATS}}
+
+    target, duo = report.target_name, str(report.duo_name)
+    diff_duo = {k: -v for k, v in report.diff.items()}
+    return {
+        "verdict": {"header": safe_format(T['lbl_duo_detected'], target, duo, escape=False),
+                    "title": T[f"v_{report.verdict}"], "sub": safe_format(T[f"s_{report.verdict}"], target, duo, escape=False),
+                    "color": report.color, "games": report.games, "winrate": report.winrate,
+                    "progress": None if report.final else f"{report.matches_scanned}/{report.matches_total}"},
+        "radar": {"axes": RADAR_AXES, "series": [{"name": target, "color": '#00c6ff', "values": [round(v, 1) for v in report.radar_me]},
+                                                 {"name": duo, "color": '#ff0055', "values": [round(v, 1) for v in report.radar_duo]}]},
+        "players": [player(target, report.riot_id, report.role_me, report.avg_me, report.diff, '#00c6ff', report.champs_me, report.champ_keys_me),
+                    player(duo, report.duo_full_id, report.role_duo, report.avg_duo, diff_duo, '#ff0055', report.champs_duo, report.champ_keys_duo)],
+        "profile_label": T['btn_profile'],
+        "icons": icons,
+    }
+
+def render_duo(report, scroll=False, key=0):
+    """Verdict, radar et cartes d'un DuoReport. Appelable en boucle pendant le scan (report.final=False).
+
+    La vue d'un rapport final est mémoïsée par (empreinte, langue) : rerun ou changement de langue
+    déjà vu = aucun recalcul.
+    """
+    cache_key = (report.riot_id, report.fingerprint, lang_code)
+    view = render_cache().get(cache_key) if report.final and report.fingerprint else None
+    if view is None:
+        view = duo_view(report)
+        if report.final and report.fingerprint: render_cache().put(cache_key, view)
+
+    # Une icône ne part qu'une fois par session : le composant la garde en localStorage pour les vues suivantes
+    sent = st.session_state.setdefault("sent_icons", set())
+    icons = {k: v for k, v in view["icons"].items() if k not in sent}
+    sent.update(icons)
+    # key unique par rendu : deux composants identiques dans le même run lèveraient une erreur d'ID dupliqué
+    duo_component(view={**view, "icons": icons}, scroll=scroll, key=f"duo_{key}", default=None)
+
+def render_solo(report):
+    st.markdown(f"""<div class="verdict-box" style="border-color:#888;"><div style="font-size:32px; font-weight:900; color:#888;">{T["solo"]}</div><div style="font-size:16px; color:#aaa;">{T["solo_sub"].format(n=report.matches_scanned)}</div></div>""", unsafe_allow_html=True)
 
 # --- MAIN LOOP ---
 if submitted:
-    def get_regions(r):
-        if r in ["EUW1", "EUN1", "TR1", "RU"]: return "europe"
-        elif r == "KR": return "asia"
-        else: return "americas"
-
     if "#" not in riot_id_input:
         st.error("⚠️ Format: Name#TAG")
     else:
-        parts = riot_id_input.split("#")
-        name_raw, tag = parts[0].strip(), parts[1].strip()
-        region = get_regions(region_select)
-        q_id = QUEUE_MAP.get(queue_label, 420)
-        
+        st.session_state.pop("last_report", None)
+        # Le scan demandé passe avant le préchargement lancé par le scan précédent (arrêté si aucune autre session ne l'attend)
+        if st.session_state.get("prefetch"): st.session_state.pop("prefetch").cancel()
         with st.spinner(T["loading"]):
-            try:
-                r_acc = get_puuid(quote(name_raw), tag, region, API_KEY)
-                if not r_acc: st.error(T["error_no_games"]); st.stop()
-                puuid = r_acc.json().get("puuid")
-                
-                r_match = get_matches(puuid, region, API_KEY, q_id)
-                if not r_match: st.warning(T['error_no_games']); st.stop()
-                match_ids = r_match.json()
-                if not match_ids: st.warning(T['error_no_games']); st.stop()
-            except Exception as e:
-                st.error(f"API Error: {e}"); st.stop()
-
-            duo_data = {}
-            target_name = riot_id_input
-            data_lock = threading.Lock()
-            
-            # ICI ON UTILISE MAX_WORKERS (4) POUR LE RATE LIMIT
-            with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-                future_to_match = {executor.submit(fetch_match, m, region, API_KEY): m for m in match_ids}
-                for future in concurrent.futures.as_completed(future_to_match):
-                    try:
-                        data = future.result()
-                        if not data or 'info' not in data: continue
-                        info = data['info']
-                        duration = info.get('gameDuration', 0)
-                        if duration < 300: continue
-                        duration_min = duration / 60.0
-                        
-                        parts = info.get('participants', [])
-                        me = next((p for p in parts if p['puuid'] == puuid), None)
-                        if not me: continue
-                        target_name = me.get('riotIdGameName', target_name)
-                        
-                        def ext(p):
-                            c = p.get('challenges', {})
-                            return {
-                                'kills': p.get('kills',0), 'deaths': p.get('deaths',0), 'assists': p.get('assists',0),
-                                'dmg': p.get('totalDamageDealtToChampions',0), 'gold': p.get('goldEarned',0), 'vis': p.get('visionScore',0),
-                                'obj': p.get('damageDealtToObjectives',0), 'towers': p.get('turretTakedowns',0),
-                                'kp': c.get('killParticipation',0), 'solokills': c.get('soloKills',0),
-                                'champ': p.get('championName','Unknown'), 'role': p.get('teamPosition','UNKNOWN'), 'win': p.get('win',False)
-                            }
-                        my_s = ext(me)
-                        
-                        with data_lock:
-                            for p in parts:
-                                if p['teamId'] == me['teamId'] and p['puuid'] != puuid:
-                                    gid = f"{p.get('riotIdGameName')}#{p.get('riotIdTagLine')}"
-                                    if gid not in duo_data:
-                                        duo_data[gid] = {
-                                            'name': p.get('riotIdGameName'),
-                                            'tag': p.get('riotIdTagLine'),
-                                            'puuid': p.get('puuid'),
-                                            'games': 0, 'wins': 0, 'champs': [], 'roles': [], 's_duo': [], 's_me': []
-                                        }
-                                    d = duo_data[gid]
-                                    d['games'] += 1
-                                    if p['win']: d['wins'] += 1
-                                    d['champs'].append(p.get('championName'))
-                                    d['roles'].append(p.get('teamPosition'))
-                                    
-                                    duo_s = ext(p)
-                                    for s, norm in [(duo_s, d['s_duo']), (my_s, d['s_me'])]:
-                                        n = s.copy()
-                                        n['dmg_min'] = s['dmg'] / duration_min
-                                        n['gold_min'] = s['gold'] / duration_min
-                                        n['vis_min'] = s['vis'] / duration_min
-                                        norm.append(n)
-                    except: pass
-
             st.markdown("<div id='result'></div>", unsafe_allow_html=True)
-            best_duo = None
-            max_g = 0
-            for k, v in duo_data.items():
-                if v['games'] > max_g: max_g = v['games']; best_duo = v
-            
-            if best_duo and max_g >= 2:
-                real_name = best_duo['name']
-                real_tag = best_duo['tag']
-                
-                if not real_tag or real_tag == "None":
-                    with st.spinner("Fetching duo details..."):
-                        acc_data = get_account_by_puuid(best_duo['puuid'], region, API_KEY)
-                        if acc_data:
-                            real_name = acc_data.get('gameName', real_name)
-                            real_tag = acc_data.get('tagLine', real_tag)
-
-                duo_full_id = f"{real_name}#{real_tag}"
-                duo_name_display = html.escape(real_name)
-                
-                g = best_duo['games']
-                t_safe = html.escape(target_name)
-                wr = int((best_duo['wins']/g)*100)
-                
-                try: r_duo = Counter(best_duo['roles']).most_common(1)[0][0]
-                except: r_duo = "UNKNOWN"
-                try: r_me = Counter([x['role'] for x in best_duo['s_me']]).most_common(1)[0][0]
-                except: r_me = "UNKNOWN"
-                
-                ch_duo = [c[0] for c in Counter(best_duo['champs']).most_common(3)]
-                ch_me = [c[0] for c in Counter([x['champ'] for x in best_duo['s_me']]).most_common(3)]
-                
-                def avg(l): return {k: sum(d[k] for d in l)/len(l) for k in l[0] if isinstance(l[0][k], (int,float))} if l else {}
-                avg_duo = avg(best_duo['s_duo'])
-                avg_me = avg(best_duo['s_me'])
-                
-                def ckda(s): return round((s.get('kills',0)+s.get('assists',0))/max(1,s.get('deaths',1)), 2)
-                avg_duo['kda'] = ckda(avg_duo)
-                avg_me['kda'] = ckda(avg_me)
-
-                def score(s, r):
-                    sc = min(5, s['kda']) + (s['kp']*4) + min(3, (s['vis_min']/(2.0 if r=="UTILITY" else 1.0))*2)
-                    sc += min(4, s['dmg_min']/700) if r!="UTILITY" else 0
-                    return sc + min(4, (s['obj']/5000) + (s['towers']*0.5))
-                
-                s_me = score(avg_me, r_me)
-                s_duo = score(avg_duo, r_duo)
-                ratio = s_me / max(0.1, s_duo)
-
-                diff_kda = (avg_me['kda'] - avg_duo['kda']) / 1.5
-                diff_dmg = (avg_me['dmg_min'] - avg_duo['dmg_min']) / 400
-                diff_vis = (avg_me['vis_min'] - avg_duo['vis_min']) / 0.8
-                diff_obj = (avg_me['obj'] - avg_duo['obj']) / 3000
-                
-                title, color, sub = T["v_solid"], "#00ff99", safe_format(T["s_solid"], t_safe, duo_name_display)
-                
-                if ratio > 1.15:
-                    max_diff = max(diff_kda, diff_dmg, diff_vis, diff_obj)
-                    if max_diff == diff_kda: title, color, sub = T["v_survivor"], "#FFD700", safe_format(T["s_survivor"], t_safe, duo_name_display)
-                    elif max_diff == diff_vis: title, color, sub = T["v_tactician"], "#00BFFF", safe_format(T["s_tactician"], t_safe, duo_name_display)
-                    elif max_diff == diff_obj: title, color, sub = T["v_breacher"], "#FFA500", safe_format(T["s_breacher"], t_safe, duo_name_display)
-                    else: title, color, sub = T["v_hyper"], "#ff0055", safe_format(T["s_hyper"], t_safe, duo_name_display)
-                elif ratio < 0.85:
-                    min_diff = min(diff_kda, diff_dmg, diff_vis)
-                    if min_diff == diff_kda: title, color, sub = T["v_feeder"], "#ff4444", safe_format(T["s_feeder"], t_safe, duo_name_display)
-                    elif min_diff == diff_dmg: title, color, sub = T["v_passenger"], "#888888", safe_format(T["s_passenger"], t_safe, duo_name_display)
-                    else: title, color, sub = T["v_struggle"], "#ff4444", safe_format(T["s_struggle"], t_safe, duo_name_display)
-
-                components.html(f"<script>window.parent.document.querySelector('.verdict-box').scrollIntoView({{behavior:'smooth'}});</script>", height=0)
-
-                st.markdown(f"""
-                <div class="verdict-box" style="border-color:{color}">
-                    <div style="font-size:14px; font-weight:700; color:#aaa; margin-bottom:5px; text-transform:uppercase;">{safe_format(T['lbl_duo_detected'], target=t_safe, duo=duo_name_display)}</div>
-                    <div style="font-size:clamp(30px, 6vw, 45px); font-weight:900; color:{color}; margin-bottom:10px; line-height:1.1;">{title}</div>
-                    <div style="font-size:18px; color:#eee; font-style:italic;">"{sub}"</div>
-                    <div style="margin-top:15px; color:#888; font-weight:600;">{g} Games • {wr}% Winrate</div>
-                </div>
-                """, unsafe_allow_html=True)
-
-                def norm(val, max_v): return min(100, (val / max_v) * 100)
-                d_me = [norm(avg_me.get('dmg_min',0), 1000), norm(avg_me.get('gold_min',0), 600), norm(avg_me.get('vis_min',0), 2.5), norm(avg_me.get('obj',0), 8000), norm(avg_me.get('kda',0), 5)]
-                d_duo = [norm(avg_duo.get('dmg_min',0), 1000), norm(avg_duo.get('gold_min',0), 600), norm(avg_duo.get('vis_min',0), 2.5), norm(avg_duo.get('obj',0), 8000), norm(avg_duo.get('kda',0), 5)]
-                st.plotly_chart(create_radar([d_me, d_duo], [t_safe, duo_name_display], ['#00c6ff', '#ff0055']), use_container_width=True, config={'displayModeBar': False})
-                
-                col1, col2 = st.columns(2, gap="large")
-                bdg_me = determine_playstyle(avg_me, r_me, T)
-                bdg_duo = determine_playstyle(avg_duo, r_duo, T)
-                
-                def d_card(n, c, s, b, r_i, diff, clr, full_id):
-                    bdg_h = "".join([f"<span class='badge {x[1]}'>{x[0]}</span>" for x in b])
-                    ch_h = "".join([f"<img src='{get_champ_url(x)}' style='width:55px; border-radius:50%; border:2px solid #333; margin:4px;'>" for x in c])
-                    
-                    dpm_url = get_dpm_url(full_id)
-                    
-                    def sl(l, v, d_v, p=False, k=False):
-                        val_str = f"{int(v*100)}%" if p else (f"{v:.2f}" if k else (f"{int(v/1000)}k" if v>1000 else f"{int(v)}"))
-                        if p:
-                            pct_val = d_v
-                        else:
-                            other = v - d_v
-                            if abs(other) < 0.01: pct_val = 100 if v > other else 0
-                            else: pct_val = (d_v / abs(other)) * 100
-                            
-                        if pct_val > 0: dh = f"<span class='stat-diff pos'>+{int(pct_val)}%</span>"
-                        elif pct_val < 0: dh = f"<span class='stat-diff neg'>{int(pct_val)}%</span>"
-                        else: dh = f"<span class='stat-diff neutral'>=</span>"
-                        return f"""<div class="stat-item"><div class="stat-val-container"><div class="stat-val">{val_str}</div>{dh}</div><div class="stat-lbl">{l}</div></div>"""
-
-                    gr = f"""<div class="stat-grid">
-                        {sl("KDA", s.get('kda',0), diff.get('kda',0), k=True)}
-                        {sl("KP", s.get('kp',0), diff.get('kp',0)*100, p=True)}
-                        {sl("DPM", s.get('dmg_min',0), diff.get('dmg_min',0))}
-                        {sl("VIS/M", s.get('vis_min',0), diff.get('vis_min',0))}
-                        {sl("OBJ", s.get('obj',0), diff.get('obj',0))}
-                        {sl("GOLD/M", s.get('gold_min',0), diff.get('gold_min',0))}
-                    </div>"""
-                    
-                    st.markdown(f"""
-                    <div class="player-card" style="border-top: 4px solid {clr};">
-                        <div class="player-name">{n}</div>
-                        <a href="{dpm_url}" target="_blank" class="dpm-btn">{T['btn_profile']}</a>
-                        <div class="player-sub">{r_i}</div>
-                        <div style="margin:10px 0;">{bdg_h}</div>
-                        <div style="margin-bottom:15px;">{ch_h}</div>
-                        {gr}
-                    </div>""", unsafe_allow_html=True)
-
-                diff_m = {k: avg_me.get(k,0)-avg_duo.get(k,0) for k in avg_me if isinstance(avg_me[k],(int,float))}
-                diff_d = {k: avg_duo.get(k,0)-avg_me.get(k,0) for k in avg_duo if isinstance(avg_duo[k],(int,float))}
-
-                with col1: d_card(t_safe, ch_me, avg_me, bdg_me, ROLE_ICONS.get(r_me,"UNK"), diff_m, '#00c6ff', riot_id_input)
-                with col2: d_card(duo_name_display, ch_duo, avg_duo, bdg_duo, ROLE_ICONS.get(r_duo,"UNK"), diff_d, '#ff0055', duo_full_id)
-
-            else:
-                st.markdown(f"""<div class="verdict-box" style="border-color:#888;"><div style="font-size:32px; font-weight:900; color:#888;">{T["solo"]}</div><div style="font-size:16px; color:#aaa;">{T["solo_sub"]}</div></div>""", unsafe_allow_html=True)
+            result_slot = st.empty()
+            renders = {"n": 0, "last": 0.0}
+
+            def show(report):
+                # Rendu provisoire dès qu'un duo a 2 parties, raffiné au fil des matchs (throttlé)
+                now = time.monotonic()
+                if not report.final and now - renders["last"] < PROGRESS_INTERVAL: return
+                with result_slot.container(), metrics.span("render", final=report.final):
+                    if report.has_duo:
+                        renders["n"] += 1
+                        renders["last"] = now
+                        render_duo(report, scroll=renders["n"] == 1, key=renders["n"])
+                    elif report.final:
+                        render_solo(report)
+
+            # Une seule Trace pour le scan et les rendus : analyze() la réutilise
+            with metrics.tracing() as trace:
+                try:
+                    report = analyze(riot_id_input, region_select, queue_label, API_KEY, on_progress=show, depth=depth)
+                except AccountNotFound:
+                    st.error(T["error_no_games"]); st.stop()
+                except NoGamesFound:
+                    st.warning(T['error_no_games']); st.stop()
+                except Exception as e:
+                    st.error(f"API Error: {e}"); st.stop()
+
+                show(report)
+            # Gardé pour les reruns (changement de langue, widgets) : ré-affiché sans relancer de scan
+            st.session_state["last_report"] = report
+            # Clic suivant probable : le duo. Son historique se réchauffe avec le budget restant
+            st.session_state["prefetch"] = prefetch_duo(report, API_KEY, depth)
+
+        # Panneau debug : ?debug=1 dans l'URL
+        if st.query_params.get("debug"):
+            import pandas as pd
+            with st.expander("Debug", expanded=True):
+                info = trace.to_dict()
+                st.caption(f"{info['engine']} • depth {info['depth']} • {info['wall_s']:.2f}s • "
+                           f"startup {startup_phase} {startup_s * 1000:.0f} ms (budget {STARTUP_BUDGET * 1000:.0f} ms)")
+                for region, c in info.get("concurrency", {}).items():
+                    st.caption(f"concurrence {region} • moy. {c['mean']} • min {c['min']} • max {c['max']} • fin {c['end']}")
+                st.dataframe(pd.DataFrame.from_dict(info["spans"], orient="index"), use_container_width=True)
+                st.dataframe(pd.DataFrame.from_dict(info["counters"], orient="index", columns=["value"]), use_container_width=True)
+elif st.session_state.get("last_report"):
+    report = st.session_state["last_report"]
+    st.markdown("<div id='result'></div>", unsafe_allow_html=True)
+    if report.has_duo: render_duo(report)
+    else: render_solo(report)
@@ -0,0 +1,157 @@
+"""Miroir local de Data Dragon : version courante, champion.json et icônes de champions.
+
+    dd_assets/manifest.json               dernière version connue (+ date de vérification), lue au démarrage
+    dd_assets/<version>/champion.json     index des champions, téléchargé une fois par patch
+    dd_assets/<version>/champion/<id>.png icônes, téléchargées au premier affichage
+
+Les icônes sont servies en data-URI : une page de résultat ne fait plus aucun aller-retour vers
+le CDN de Riot, même avec un cache navigateur vide.
+"""
+import base64
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+from engine import HTTP
+
+ASSETS_DIR = os.environ.get("ASSETS_DIR", "dd_assets")
+DD_CDN = "https://ddragon.leagueoflegends.com"
+DD_FALLBACK_VERSION = "14.23.1"  # Uniquement si Data Dragon n'a jamais répondu sur cette machine
+DD_CHECK_INTERVAL = 3600         # (s) Entre deux vérifications de versions.json
+PORO_URL = f"{DD_CDN}/cdn/img/champion/splash/Poro_0.jpg"
+
+_lock = threading.Lock()
+_dd = {"version": None, "checked": 0.0}  # Dernière version résolue par ce process
+_dd_lock = threading.Lock()
+_dd_thread = None
+_indexes = {}  # version -> index des champions (seuls les téléchargements réussis sont gardés)
+_icons = {}    # (version, id) -> data-URI
+_failed = {}   # version ou (version, id) -> date du dernier échec de téléchargement
+EMPTY_INDEX = {"by_key": {}, "by_name": {}}
+
+def _path(*parts):
+    return os.path.join(ASSETS_DIR, *parts)
+
+def _write(path, data):
+    """Ecriture atomique (plusieurs replicas peuvent partager le dossier)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def _read_json(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _recent_failure(key):
+    """Vrai si ce téléchargement a échoué il y a moins de DD_CHECK_INTERVAL (CDN en panne : on ne bloque pas chaque rendu)."""
+    return time.time() - _failed.get(key, 0.0) < DD_CHECK_INTERVAL
+
+def _download(url):
+    try:
+        resp = HTTP.get(url, timeout=5)
+        if resp.status_code == 200: return resp.content
+    except Exception:
+        pass
+    return None
+
+# --- VERSION ---
+def get_dd_version():
+    """Dernière version Data Dragon (bloquant) ; si le CDN ne répond pas, la dernière connue (persistée sur disque)."""
+    if time.time() - _dd["checked"] < DD_CHECK_INTERVAL: return _dd["version"]
+    manifest = _read_json(_path("manifest.json")) or {}
+    version = manifest.get("version")
+    if not version or time.time() - manifest.get("checked", 0) >= DD_CHECK_INTERVAL:
+        raw = _download(f"{DD_CDN}/api/versions.json")
+        try: fresh = json.loads(raw)[0] if raw else None
+        except (ValueError, IndexError): fresh = None
+        if fresh:
+            version = fresh
+            _write(_path("manifest.json"), json.dumps({"version": version, "checked": time.time()}).encode())
+    # Echec du CDN compris : pas de nouvel essai avant DD_CHECK_INTERVAL
+    _dd.update(version=version or DD_FALLBACK_VERSION, checked=time.time())
+    return _dd["version"]
+
+def current_dd_version():
+    """Version utilisable tout de suite, sans réseau : celle du process, sinon manifest.json, sinon DD_FALLBACK_VERSION.
+
+    Si elle a plus de DD_CHECK_INTERVAL, get_dd_version() repart dans un thread : le démarrage de l'app
+    n'attend jamais le CDN, et les rendus suivants (un scan dure plus longtemps que versions.json) ont la bonne.
+    """
+    global _dd_thread
+    if time.time() - _dd["checked"] < DD_CHECK_INTERVAL: return _dd["version"]
+    with _dd_lock:
+        if _dd_thread is None or not _dd_thread.is_alive():
+            _dd_thread = threading.Thread(target=get_dd_version, daemon=True, name="dd-version")
+            _dd_thread.start()
+    return _dd["version"] or (_read_json(_path("manifest.json")) or {}).get("version") or DD_FALLBACK_VERSION
+
+# --- INDEX DES CHAMPIONS ---
+def normalize(name):
+    """'Nunu & Willump' / "Kog'Maw" / 'MonkeyKing' -> clé de recherche (minuscules alphanumériques)."""
+    return re.sub(r"[^a-z0-9]", "", str(name).lower())
+
+def champion_index(version):
+    """{'by_key': {championId: entrée}, 'by_name': {nom normalisé: entrée}} pour ce patch.
+
+    champion.json n'est téléchargé qu'une fois par version ; les dossiers des patchs précédents sont supprimés.
+    Un échec est gardé DD_CHECK_INTERVAL (index vide, comme get_dd_version garde sa version).
+    """
+    if version in _indexes: return _indexes[version]
+    if _recent_failure(version): return EMPTY_INDEX
+    path = _path(version, "champion.json")
+    data = _read_json(path)
+    if data is None:
+        with _lock:
+            data = _read_json(path)
+            if data is None:
+                if _recent_failure(version): return EMPTY_INDEX
+                raw = _download(f"{DD_CDN}/cdn/{version}/data/en_US/champion.json")
+                try: data = json.loads(raw)["data"] if raw else None
+                except (ValueError, KeyError): data = None
+                if data is None:
+                    _failed[version] = time.time()
+                    return EMPTY_INDEX
+                _write(path, json.dumps(data).encode())
+                for old in os.listdir(ASSETS_DIR):
+                    if old != version and os.path.isdir(_path(old)): shutil.rmtree(_path(old), ignore_errors=True)
+    by_key, by_name = {}, {}
+    for c in data.values():
+        entry = {"id": c["id"], "name": c["name"], "image": c["image"]["full"]}
+        by_key[int(c["key"])] = entry
+        by_name[normalize(c["id"])] = by_name[normalize(c["name"])] = entry
+    _indexes[version] = {"by_key": by_key, "by_name": by_name}
+    return _indexes[version]
+
+def resolve_champion(version, key=None, name=None):
+    """Entrée champion.json à partir du championId (match-v5) ou, à défaut, du nom."""
+    index = champion_index(version)
+    return index["by_key"].get(int(key or 0)) or (index["by_name"].get(normalize(name)) if name else None)
+
+# --- ICONES ---
+def champion_icon(version, key=None, name=None):
+    """data-URI de l'icône (téléchargée une seule fois puis lue sur disque), URL du CDN en dernier recours."""
+    champ = resolve_champion(version, key, name)
+    if not champ: return PORO_URL
+    if (version, champ["id"]) in _icons: return _icons[(version, champ["id"])]
+    url = f"{DD_CDN}/cdn/{version}/img/champion/{champ['image']}"
+    path = _path(version, "champion", champ["image"])
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        if _recent_failure((version, champ["id"])): return url
+        data = _download(url)
+        if data is None:
+            _failed[(version, champ["id"])] = time.time()
+            return url
+        _write(path, data)
+    _icons[(version, champ["id"])] = "data:image/png;base64," + base64.b64encode(data).decode("ascii")
+    return _icons[(version, champ["id"])]
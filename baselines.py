@@ -0,0 +1,238 @@
+"""Index de percentiles par file et par rôle, construit à partir des matchs du cache disque.
+
+    python baselines.py            # ajoute les matchs arrivés depuis la dernière construction
+    python baselines.py --full     # reconstruit tout l'index à partir des matchs encore en cache
+
+Le scoring (score, verdict, badges, radar) compare un joueur à la distribution de son rôle dans sa
+file au lieu de seuils fixes (700 dmg/min, 5000 dégâts aux objectifs...). Le moteur juge des moyennes
+sur plusieurs parties : une ligne de table est donc la moyenne d'un joueur (au moins
+BASELINE_PLAYER_GAMES parties dans ce rôle et cette file), pas une partie isolée, sans quoi toutes les
+moyennes retombent vers le 50e percentile. Tant qu'une table a moins de BASELINE_MIN_PLAYERS joueurs,
+le moteur garde ses constantes.
+
+Etat de construction (BASELINE_STATE_PATH, SQLite) : sommes par (file, rôle, joueur), IDs des matchs
+déjà comptés et watermark = dernier rowid lu dans la table matches. Une construction incrémentale ne
+lit que les lignes au-delà du watermark ; un match réécrit (nouveau rowid) n'est pas recompté. Les
+matchs évincés du cache restent dans les sommes : --full, qui repart de zéro, ne voit que ceux encore
+en cache et peut donc donner des tables un peu différentes.
+
+Index (BASELINE_PATH, JSON) : un histogramme à pas fixe par stat et par table "<file>:<rôle>" (plus
+"<file>:ALL"), réécrit à chaque construction. Les percentiles sont dérivés au chargement, une lecture
+coûte un index de tableau.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+BASELINE_PATH = os.environ.get("BASELINE_PATH", "baselines.json")
+BASELINE_STATE_PATH = os.environ.get("BASELINE_STATE_PATH", "baselines.state.sqlite3")
+BASELINE_PLAYER_GAMES = 5   # Parties min d'un joueur (dans ce rôle, cette file) pour que sa moyenne compte
+BASELINE_MIN_PLAYERS = 100  # Joueurs min pour qu'une table remplace les constantes
+BASELINE_RELOAD = 60        # (s) Entre deux vérifications du fichier (reconstruit par un autre process)
+MIN_DURATION = 300          # (s) Remakes ignorés, comme dans DuoAccumulator
+FORMAT = 2                  # Version du JSON (pas des histogrammes) : un index d'une autre version est ignoré
+
+# Stat -> (pas, nb de cases) ; au-delà de la dernière case, la valeur compte dans la dernière
+STAT_BINS = {
+    "kda": (0.1, 200),
+    "kp": (0.01, 100),
+    "dmg_min": (10, 250),
+    "gold_min": (5, 200),
+    "vis_min": (0.05, 100),
+    "obj": (200, 200),
+    "towers": (0.1, 110),
+    "solokills": (0.1, 100),
+}
+# Sommes gardées par joueur : le KDA se déduit des moyennes kills/deaths/assists, comme with_kda
+SUM_COLS = ("kills", "deaths", "assists", "kp", "dmg_min", "gold_min", "vis_min", "obj", "towers", "solokills")
+
+def participant_sums(p, duration_min):
+    """Valeurs d'un Participant (MatchRecord) sur les mêmes échelles que les lignes de DuoAccumulator."""
+    return (p.kills, p.deaths, p.assists, p.kp, p.dmg / duration_min, p.gold / duration_min, p.vis / duration_min,
+            p.obj, p.towers, p.solokills)
+
+def player_stats(n, sums):
+    """Moyennes d'un joueur (n parties) -> stats indexées, comme DuoAccumulator.averages."""
+    avg = dict(zip(SUM_COLS, (v / n for v in sums)))
+    avg["kda"] = (avg["kills"] + avg["assists"]) / max(1, avg["deaths"])
+    return {stat: avg[stat] for stat in STAT_BINS}
+
+def _bin(stat, value):
+    step, bins = STAT_BINS[stat]
+    return min(bins - 1, max(0, int(value / step)))
+
+# --- LECTURE ---
+class Table:
+    """Percentiles d'une (file, rôle) : pct() = part des joueurs sous la valeur (rang moyen dans sa case), 0-1.
+
+    role = "ALL" pour la table de toute la file (repli de lookup), qui ne tient pas compte du rôle.
+    """
+
+    def __init__(self, n, hist, role="ALL"):
+        self.n = n
+        self.role = role
+        self.cdf = {}
+        for stat, (_, bins) in STAT_BINS.items():
+            counts = (hist.get(stat) or []) + [0] * bins
+            total, below, cdf = sum(counts[:bins]) or 1, 0, []
+            for c in counts[:bins]:
+                cdf.append((below + c / 2) / total)
+                below += c
+            self.cdf[stat] = cdf
+
+    def pct(self, stat, value):
+        return self.cdf[stat][_bin(stat, value or 0)]
+
+class Index:
+    def __init__(self, data):
+        if data.get("format") != FORMAT: data = {}
+        self.watermark = data.get("watermark", 0)
+        self.tables = {k: Table(t["n"], t["hist"], k.split(":", 1)[1]) for k, t in data.get("tables", {}).items() if t["n"] >= BASELINE_MIN_PLAYERS}
+
+    def lookup(self, queue, role):
+        return self.tables.get(f"{queue}:{role}") or self.tables.get(f"{queue}:ALL")
+
+_lock = threading.Lock()
+_index = {"index": Index({}), "mtime": None, "checked": None}
+
+def current():
+    """Index chargé (rechargé si le fichier a changé, vérifié au plus toutes les BASELINE_RELOAD s)."""
+    now = time.monotonic()
+    fresh = lambda: _index["checked"] is not None and now - _index["checked"] < BASELINE_RELOAD
+    if fresh(): return _index["index"]
+    with _lock:
+        if not fresh():
+            try: mtime = os.path.getmtime(BASELINE_PATH)
+            except OSError: mtime = None
+            if mtime != _index["mtime"]:
+                _index["index"] = Index(_read(BASELINE_PATH) or {})
+                _index["mtime"] = mtime
+            _index["checked"] = now
+    return _index["index"]
+
+def lookup(queue, role):
+    """Table de percentiles de ce rôle dans cette file (ou de toute la file), None si l'index n'en a pas assez."""
+    if queue is None: return None
+    return current().lookup(queue, role)
+
+def version():
+    """Watermark de l'index chargé : change à chaque reconstruction (entre dans l'empreinte des rapports)."""
+    return current().watermark
+
+def _read(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+# --- CONSTRUCTION ---
+class BuildState:
+    """Sommes par (file, rôle, joueur) et matchs déjà comptés, persistées entre deux constructions."""
+
+    def __init__(self, path, full=False):
+        if full:
+            for suffix in ("", "-wal", "-shm"):
+                try: os.remove(path + suffix)
+                except OSError: pass
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        cols = ", ".join(f"{c} REAL NOT NULL" for c in SUM_COLS)
+        self.db.execute(f"CREATE TABLE IF NOT EXISTS players (queue INTEGER NOT NULL, role TEXT NOT NULL, puuid TEXT NOT NULL,"
+                        f" n INTEGER NOT NULL, {cols}, PRIMARY KEY (queue, role, puuid))")
+        self.db.execute("CREATE TABLE IF NOT EXISTS counted (match_id TEXT PRIMARY KEY)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'watermark'").fetchone()
+        self.watermark = row[0] if row else 0
+
+    def claim(self, match_id):
+        """Vrai si ce match n'a jamais été compté (il l'est désormais)."""
+        return self.db.execute("INSERT OR IGNORE INTO counted (match_id) VALUES (?)", (match_id,)).rowcount == 1
+
+    def add(self, sums):
+        """sums : {(file, rôle, puuid): [n, *SUM_COLS]} d'un lot de matchs, ajoutées aux totaux."""
+        update = ", ".join(f"{c} = {c} + excluded.{c}" for c in ("n",) + SUM_COLS)
+        self.db.executemany(f"INSERT INTO players VALUES ({', '.join('?' * (4 + len(SUM_COLS)))})"
+                            f" ON CONFLICT (queue, role, puuid) DO UPDATE SET {update}",
+                            [(*key, *values) for key, values in sums.items()])
+
+    def commit(self, watermark):
+        self.watermark = watermark
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('watermark', ?)", (watermark,))
+        self.db.commit()
+
+    def tables(self):
+        """Histogrammes de l'index, à partir des joueurs qui ont assez de parties."""
+        tables = {}
+        rows = self.db.execute(f"SELECT queue, role, n, {', '.join(SUM_COLS)} FROM players WHERE n >= ?", (BASELINE_PLAYER_GAMES,))
+        for queue, role, n, *sums in rows:
+            t = tables.setdefault(f"{queue}:{role}", {"n": 0, "hist": {}})
+            t["n"] += 1
+            for stat, value in player_stats(n, sums).items():
+                hist = t["hist"].setdefault(stat, [])
+                i = _bin(stat, value)
+                if i >= len(hist): hist.extend([0] * (i + 1 - len(hist)))
+                hist[i] += 1
+        return tables
+
+    def close(self):
+        self.db.close()
+
+def add_match(sums, record):
+    """Ajoute les participants d'un MatchRecord aux sommes du lot (modifiées en place)."""
+    if record is None or record.duration < MIN_DURATION: return
+    duration_min = record.duration / 60.0
+    for p in record.participants:
+        values = participant_sums(p, duration_min)
+        for role in (p.role or "UNKNOWN", "ALL"):
+            acc = sums.setdefault((record.queue, role, p.puuid), [0] * (1 + len(SUM_COLS)))
+            acc[0] += 1
+            for i, v in enumerate(values, 1): acc[i] += v
+
+def rebuild(path=None, store=None, full=False, state_path=None):
+    """Ajoute aux sommes les matchs du MatchStore au-delà du watermark (tous si full), puis réécrit l'index.
+
+    Renvoie (nb de matchs ajoutés, données de l'index).
+    """
+    import engine  # Le moteur importe ce module pour le scoring : pas d'import circulaire au chargement
+    path = path or BASELINE_PATH
+    store = store or engine.get_match_store()
+    state = BuildState(state_path or BASELINE_STATE_PATH, full)
+    try:
+        n, watermark, sums = 0, state.watermark, {}
+        for rowid, record in store.iter_since(state.watermark):
+            if record is not None and state.claim(record.match_id):
+                add_match(sums, record)
+                n += 1
+            watermark = rowid
+            if len(sums) >= 50_000:
+                state.add(sums)
+                sums = {}
+        state.add(sums)
+        state.commit(watermark)
+        data = {"format": FORMAT, "watermark": watermark, "built": time.time(), "tables": state.tables()}
+    finally:
+        state.close()
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp, path)
+    return n, data
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Construit l'index de percentiles (file x rôle) à partir du cache de matchs.")
+    parser.add_argument("--full", action="store_true", help="Repartir de zéro (matchs encore en cache seulement) au lieu du watermark")
+    parser.add_argument("-o", "--output", default=BASELINE_PATH)
+    parser.add_argument("--state", default=BASELINE_STATE_PATH, help="Etat de construction (SQLite)")
+    args = parser.parse_args(argv)
+    t0 = time.perf_counter()
+    n, data = rebuild(args.output, full=args.full, state_path=args.state)
+    usable = sorted(k for k, t in data["tables"].items() if t["n"] >= BASELINE_MIN_PLAYERS)
+    print(f"{n} matchs ajoutés en {time.perf_counter() - t0:.1f}s (watermark {data['watermark']}) ; tables utilisables : {', '.join(usable) or 'aucune'}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,112 @@
+"""Analyse en masse d'une liste de Riot IDs, sans navigateur.
+
+    python batch.py roster.txt --region EUW1 --queue "Ranked Solo/Duo" -o out.csv
+    python batch.py roster.txt --roster -o graph.json
+
+Un Riot ID par ligne (Name#TAG, ou Name#TAG,KR pour une autre plateforme que --region). Les scans
+partagent le cache de matchs et le budget de rate limit du moteur ; la sortie est en JSON ou CSV
+selon l'extension (ou --format). Avec --roster, le fichier est analysé comme une équipe : graphe des
+paires (CSV = une ligne par paire) et un rapport par membre, chaque match n'étant lu qu'une fois.
+"""
+import argparse
+import concurrent.futures
+import csv
+import json
+import sys
+
+import engine
+
+STAT_KEYS = ["kda", "kp", "dmg_min", "gold_min", "vis_min", "obj", "towers", "solokills", "kills", "deaths", "assists"]
+
+def read_ids(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+def scan_one(riot_id, region, queue, api_key, depth=None, start_time=None, end_time=None):
+    try:
+        return engine.analyze(riot_id, region, queue, api_key, depth=depth, start_time=start_time, end_time=end_time).to_dict()
+    except engine.ScanError as e:
+        return {"riot_id": riot_id, "error": type(e).__name__}
+    except Exception as e:
+        return {"riot_id": riot_id, "error": str(e)}
+
+def to_row(r):
+    """Rapport -> ligne CSV à plat (listes jointes par '|', moyennes préfixées me_/duo_)."""
+    row = {k: r.get(k) for k in ("riot_id", "region", "queue", "target_name", "matches_scanned", "verdict", "games", "wins", "winrate", "role_me", "role_duo", "ratio", "error")}
+    row["duo"] = f"{r['duo_name']}#{r['duo_tag']}" if r.get("duo_name") else None
+    row["champs_me"] = "|".join(r.get("champs_me") or [])
+    row["champs_duo"] = "|".join(r.get("champs_duo") or [])
+    for side in ("me", "duo"):
+        avg = r.get(f"avg_{side}") or {}
+        for k in STAT_KEYS:
+            row[f"{side}_{k}"] = round(avg[k], 3) if k in avg else None
+    return row
+
+def write_roster(roster, out, fmt):
+    if fmt == "json":
+        json.dump(roster.to_dict(), out, ensure_ascii=False, indent=2)
+        out.write("\n")
+    else:
+        writer = csv.DictWriter(out, fieldnames=["a", "b", "games", "wins", "winrate", "roster", "a_puuid", "b_puuid"])
+        writer.writeheader()
+        writer.writerows(roster.pairs)
+
+def write_output(results, out, fmt):
+    if fmt == "json":
+        json.dump(results, out, ensure_ascii=False, indent=2)
+        out.write("\n")
+    else:
+        rows = [to_row(r) for r in results]
+        fields = list(to_row({}).keys())
+        writer = csv.DictWriter(out, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse de duos en masse (JSON/CSV).")
+    parser.add_argument("ids_file", help="Fichier texte, un Riot ID (Name#TAG) par ligne")
+    parser.add_argument("--region", default="EUW1", help="Plateforme (EUW1, NA1, KR...) ou région de routage")
+    parser.add_argument("--queue", default="Ranked Solo/Duo", help="Libellé de file (cf. QUEUE_MAP) ou id numérique")
+    parser.add_argument("--depth", type=int, help="Nb max de parties par joueur (historique paginé, défaut MATCH_COUNT)")
+    parser.add_argument("--start-time", type=int, help="Ne garder que les parties après cet instant (epoch secondes)")
+    parser.add_argument("--end-time", type=int, help="Ne garder que les parties avant cet instant (epoch secondes)")
+    parser.add_argument("-o", "--output", help="Fichier de sortie (stdout par défaut)")
+    parser.add_argument("--format", choices=["json", "csv"], help="Déduit de l'extension de --output, JSON par défaut")
+    parser.add_argument("--jobs", type=int, default=2, help="Joueurs scannés en parallèle (le rate limiter reste partagé)")
+    parser.add_argument("--api-key", help="Clé Riot (sinon RIOT_API_KEY)")
+    parser.add_argument("--roster", action="store_true", help="Analyse d'équipe : graphe des paires (qui joue avec qui) + rapport par membre")
+    parser.add_argument("--min-games", type=int, default=2, help="Avec --roster : nb mini de parties ensemble pour garder une paire")
+    args = parser.parse_args(argv)
+
+    queue = int(args.queue) if args.queue.isdigit() else args.queue
+    fmt = args.format or ("csv" if (args.output or "").endswith(".csv") else "json")
+    players = [engine.parse_player(line, args.region) for line in read_ids(args.ids_file)]
+    ids = [rid for rid, _ in players]
+
+    if args.roster:
+        roster = engine.scan_roster(players, queue, args.api_key, args.depth, args.min_games)
+        print(f"{len(roster.members)} joueurs, {len(roster.pairs)} paires, {roster.matches_fetched} matchs lus pour {roster.matches_listed} listés", file=sys.stderr)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8", newline="") as out:
+                write_roster(roster, out, fmt)
+        else:
+            write_roster(roster, sys.stdout, fmt)
+        return 0 if all(not m["error"] for m in roster.members) else 1
+
+    results = [None] * len(ids)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        futures = {executor.submit(scan_one, rid, region, queue, args.api_key, args.depth, args.start_time, args.end_time): i for i, (rid, region) in enumerate(players)}
+        for n, future in enumerate(concurrent.futures.as_completed(futures), 1):
+            i = futures[future]
+            results[i] = future.result()
+            print(f"[{n}/{len(ids)}] {ids[i]}: {results[i].get('error') or results[i].get('verdict')}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as out:
+            write_output(results, out, fmt)
+    else:
+        write_output(results, sys.stdout, fmt)
+    return 0 if all("error" not in r for r in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
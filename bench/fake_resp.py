@@ -0,0 +1,124 @@
+"""Faux serveur Redis (RESP) pour tester cache.py sans Redis : même sous-ensemble que RespClient.
+
+    python bench/fake_resp.py --port 6399 --password secret
+    CACHE_URL=redis://:secret@127.0.0.1:6399/0 streamlit run app.py
+    python bench/run.py --resp                       # le bench démarre le sien et y pointe CACHE_URL
+
+Commandes : PING, AUTH, SELECT, GET, SET [NX] [PX ms | EX s], DEL, FLUSHDB. Expiration vérifiée à la
+lecture, une base par numéro de SELECT. Les compteurs (commandes, verrous SET NX pris ou refusés)
+servent au benchmark pour vérifier l'anti-stampede de shared_cache.
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+class FakeResp:
+    """Etat partagé du serveur : données (par base), mot de passe, latence, compteurs."""
+
+    def __init__(self, password=None, latency=0.0):
+        self.password, self.latency = password, latency
+        self.lock = threading.Lock()
+        self.dbs = {}  # n° de base -> {clé: (valeur, expiration monotonic ou None)}
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.commands = {}
+            self.nx_won = 0
+            self.nx_lost = 0
+
+    def execute(self, session, args):
+        """Une commande -> valeur Python (str = +simple, bytes = $bulk, int, None, Exception = -erreur)."""
+        cmd, args = args[0].decode().upper(), args[1:]
+        with self.lock:
+            self.commands[cmd] = self.commands.get(cmd, 0) + 1
+        if cmd == "AUTH":
+            if self.password is None: return ValueError("ERR AUTH <password> called without any password configured")
+            if args[-1].decode() != self.password: return ValueError("WRONGPASS invalid username-password pair")
+            session["auth"] = True
+            return "OK"
+        if self.password is not None and not session.get("auth"): return ValueError("NOAUTH Authentication required.")
+        if cmd == "PING": return "PONG"
+        if cmd == "SELECT":
+            session["db"] = int(args[0])
+            return "OK"
+        now = time.monotonic()
+        with self.lock:
+            db = self.dbs.setdefault(session.get("db", 0), {})
+            if cmd == "GET":
+                hit = db.get(args[0])
+                if hit and hit[1] is not None and hit[1] <= now:
+                    del db[args[0]]
+                    hit = None
+                return hit[0] if hit else None
+            if cmd == "SET":
+                key, value, opts = args[0], args[1], [a.decode().upper() for a in args[2:]]
+                expires = None
+                if "PX" in opts: expires = now + int(opts[opts.index("PX") + 1]) / 1000
+                if "EX" in opts: expires = now + int(opts[opts.index("EX") + 1])
+                if "NX" in opts:
+                    hit = db.get(key)
+                    if hit and (hit[1] is None or hit[1] > now):
+                        self.nx_lost += 1
+                        return None
+                    self.nx_won += 1
+                db[key] = (value, expires)
+                return "OK"
+            if cmd == "DEL":
+                return sum(db.pop(k, None) is not None for k in args)
+            if cmd == "FLUSHDB":
+                db.clear()
+                return "OK"
+        return ValueError(f"ERR unknown command '{cmd}'")
+
+def encode(value):
+    if isinstance(value, Exception): return b"-%s\r\n" % str(value).encode()
+    if value is None: return b"$-1\r\n"
+    if isinstance(value, str): return b"+%s\r\n" % value.encode()
+    if isinstance(value, int): return b":%d\r\n" % value
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+def make_handler(state):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            session = {}
+            while True:
+                line = self.rfile.readline()
+                if not line: return
+                if not line.startswith(b"*"): return  # Seul le format tableau de RespClient est accepté
+                args = []
+                for _ in range(int(line[1:])):
+                    n = int(self.rfile.readline()[1:])
+                    args.append(self.rfile.read(n + 2)[:-2])
+                if state.latency: time.sleep(state.latency)
+                self.wfile.write(encode(state.execute(session, args)))
+                self.wfile.flush()
+    return Handler
+
+class Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def start(port=0, **kwargs):
+    """Démarre le serveur dans un thread ; renvoie (serveur, état FakeResp). port=0 -> port libre."""
+    state = FakeResp(**kwargs)
+    server = Server(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True, name="fake-resp").start()
+    return server, state
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Faux serveur Redis (RESP) pour cache.py.")
+    parser.add_argument("--port", type=int, default=6399)
+    parser.add_argument("--password", help="Exige AUTH (redis://:motdepasse@...)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latence par commande (s)")
+    args = parser.parse_args(argv)
+    server, _ = start(args.port, password=args.password, latency=args.latency)
+    print(f"Fake RESP sur redis://127.0.0.1:{server.server_address[1]}/0")
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Faux serveur Riot (account-v1 + match-v5) pour mesurer le moteur sans clé ni réseau.
+
+    python bench/fake_riot.py --port 8099 --latency 0.05 --rate-429 0.02
+    RIOT_API_BASE=http://127.0.0.1:8099/{region} streamlit run app.py
+
+La région de routage est le 1er segment du chemin (/europe/lol/match/v5/...). Les réponses sont
+synthétiques et déterministes (même match ID -> même payload), ou rejouées depuis un dossier
+enregistré (--fixtures) :
+
+    fixtures/account.json          réponse account-v1 du joueur ciblé (puuid, gameName, tagLine)
+    fixtures/matches/<matchId>.json  payloads match-v5 (les IDs servis par /ids, du plus récent au plus ancien)
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+TARGET_PUUID = "bench-puuid-0"
+PLAYERS = [f"bench-puuid-{i}" for i in range(40)]
+CHAMPIONS = [("Ahri", 103), ("MonkeyKing", 62), ("Kaisa", 145), ("Lux", 99), ("Jinx", 222), ("Thresh", 412), ("LeeSin", 64), ("Darius", 122)]
+ROLES = ["TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY"]
+HISTORY_SIZE = 1000
+NEWEST_START = 1_700_000_000  # Début (epoch s) du match le plus récent ; une partie toutes les heures avant
+
+def match_number(m_id):
+    return int(m_id.split("_")[1])
+
+def synthetic_match(m_id, queue=420):
+    """Payload match-v5 plausible : la cible joue ~60% de ses parties avec bench-puuid-1."""
+    rnd = random.Random(m_id)
+    others = rnd.sample(PLAYERS[2:], 8)
+    mate = PLAYERS[1] if rnd.random() < 0.6 else others.pop()
+    teams = ((100, [TARGET_PUUID, mate] + others[:3]), (200, others[3:8]))
+    winner = rnd.choice((100, 200))
+    start = (NEWEST_START - (HISTORY_SIZE - match_number(m_id)) * 3600) * 1000
+    duration = rnd.randint(1200, 2300)
+    participants = []
+    for team_id, team in teams:
+        for i, puuid in enumerate(team):
+            champ, champ_id = rnd.choice(CHAMPIONS)
+            participants.append({
+                "puuid": puuid, "teamId": team_id, "win": team_id == winner,
+                "riotIdGameName": puuid.upper(), "riotIdTagLine": "BNCH",
+                "championName": champ, "championId": champ_id, "teamPosition": ROLES[i],
+                "kills": rnd.randint(0, 14), "deaths": rnd.randint(0, 10), "assists": rnd.randint(0, 18),
+                "totalDamageDealtToChampions": rnd.randint(4000, 45000), "goldEarned": rnd.randint(6000, 17000),
+                "visionScore": rnd.randint(4, 90), "damageDealtToObjectives": rnd.randint(0, 16000),
+                "turretTakedowns": rnd.randint(0, 5),
+                "challenges": {"killParticipation": round(rnd.random(), 3), "soloKills": rnd.randint(0, 3)},
+            })
+    return {"metadata": {"matchId": m_id, "participants": [p["puuid"] for p in participants]},
+            "info": {"gameCreation": start, "gameStartTimestamp": start, "gameDuration": duration, "queueId": queue, "participants": participants}}
+
+class FakeRiot:
+    """Etat partagé du serveur : données servies, latence, injection de 429, compteurs."""
+
+    def __init__(self, latency=0.0, jitter=0.0, rate_429=0.0, retry_after=1, app_limit="20000:10", fixtures=None, seed=0):
+        self.latency, self.jitter, self.rate_429, self.retry_after = latency, jitter, rate_429, retry_after
+        self.app_limit = app_limit
+        self.rnd = random.Random(seed)
+        self.lock = threading.Lock()
+        self.account = {"puuid": TARGET_PUUID, "gameName": "Bench", "tagLine": "BNCH"}
+        self.matches = {}
+        self.ids = [f"EUW1_{HISTORY_SIZE - i}" for i in range(HISTORY_SIZE)]
+        if fixtures: self.load_fixtures(fixtures)
+        self.reset()
+
+    def load_fixtures(self, path):
+        with open(os.path.join(path, "account.json"), encoding="utf-8") as f:
+            self.account = json.load(f)
+        mdir = os.path.join(path, "matches")
+        for name in os.listdir(mdir):
+            with open(os.path.join(mdir, name), encoding="utf-8") as f:
+                data = json.load(f)
+            self.matches[data["metadata"]["matchId"]] = data
+        self.ids = sorted(self.matches, key=lambda m: self.matches[m]["info"].get("gameStartTimestamp", 0), reverse=True)
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.throttled = 0
+            self.by_endpoint = {}
+
+    def count(self, endpoint, throttled):
+        with self.lock:
+            self.requests += 1
+            self.throttled += throttled
+            self.by_endpoint[endpoint] = self.by_endpoint.get(endpoint, 0) + 1
+
+    def should_throttle(self):
+        with self.lock:
+            return self.rnd.random() < self.rate_429
+
+    def match(self, m_id):
+        if m_id in self.matches: return self.matches[m_id]
+        if self.matches or not re.fullmatch(r"EUW1_\d+", m_id) or not 0 < match_number(m_id) <= HISTORY_SIZE: return None
+        return synthetic_match(m_id)
+
+    def route(self, path, query):
+        """(endpoint, status, body) pour un chemin sans le préfixe de région."""
+        if m := re.fullmatch(r"/riot/account/v1/accounts/by-riot-id/([^/]+)/([^/]+)", path):
+            return "account-by-riot-id", 200, self.account
+        if m := re.fullmatch(r"/riot/account/v1/accounts/by-puuid/([^/]+)", path):
+            return "account-by-puuid", 200, {"puuid": m.group(1), "gameName": m.group(1).upper(), "tagLine": "BNCH"}
+        if m := re.fullmatch(r"/lol/match/v5/matches/by-puuid/([^/]+)/ids", path):
+            ids = self.ids if m.group(1) == self.account["puuid"] else []
+            start_time, end_time = query.get("startTime"), query.get("endTime")
+            if start_time or end_time:
+                ids = [i for i in ids if int(start_time or 0) <= self.match(i)["info"]["gameStartTimestamp"] // 1000 <= int(end_time or 1e12)]
+            start, count = int(query.get("start", 0)), min(100, int(query.get("count", 20)))
+            return "match-ids", 200, ids[start:start + count]
+        if m := re.fullmatch(r"/lol/match/v5/matches/([^/]+)", path):
+            data = self.match(m.group(1))
+            return "match", (200 if data else 404), (data or {"status": {"status_code": 404}})
+        return "unknown", 404, {"status": {"status_code": 404}}
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, comme l'API réelle
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            _region, _, rest = parts.path.lstrip("/").partition("/")
+            query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+            endpoint, status, body = state.route("/" + rest, query)
+            if state.latency or state.jitter:
+                time.sleep(state.latency + random.random() * state.jitter)
+            throttled = status == 200 and state.should_throttle()
+            state.count(endpoint, throttled)
+            headers = {"X-App-Rate-Limit": state.app_limit, "X-App-Rate-Limit-Count": ",".join(f"1:{w.split(':')[1]}" for w in state.app_limit.split(","))}
+            if throttled:
+                status, body = 429, {"status": {"message": "Rate limit exceeded", "status_code": 429}}
+                headers.update({"Retry-After": str(state.retry_after), "X-Rate-Limit-Type": "method"})
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            for k, v in headers.items(): self.send_header(k, v)
+            self.send_header("Content-Type", "application/json;charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+    return Handler
+
+def start(port=0, **kwargs):
+    """Démarre le serveur dans un thread ; renvoie (serveur, état FakeRiot). port=0 -> port libre."""
+    state = FakeRiot(**kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="fake-riot").start()
+    return server, state
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Faux serveur Riot API (account-v1, match-v5).")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.0, help="Latence fixe par réponse (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Latence aléatoire ajoutée, uniforme sur [0, jitter] (s)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Proportion de réponses remplacées par un 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After des 429 (s)")
+    parser.add_argument("--app-limit", default="20000:10", help="X-App-Rate-Limit annoncé (ex. '20:1,100:120' pour une clé de dev)")
+    parser.add_argument("--fixtures", help="Dossier de réponses enregistrées (account.json + matches/*.json)")
+    args = parser.parse_args(argv)
+    server, _ = start(args.port, latency=args.latency, jitter=args.jitter, rate_429=args.rate_429,
+                      retry_after=args.retry_after, app_limit=args.app_limit, fixtures=args.fixtures)
+    print(f"Fake Riot API sur http://127.0.0.1:{server.server_address[1]}/{{region}}")
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Benchmark du scan complet contre le faux serveur Riot (aucune clé, aucun réseau).
+
+    python bench/run.py                                  # 10/100/500 matchs x 4/8/16 workers, moteur threads
+    python bench/run.py --engine threads async --latency 0.08 --rate-429 0.02 --json bench.json
+    python bench/run.py --resp                           # cache partagé sur un faux Redis (fake_resp.py) au lieu de SQLite
+
+Chaque configuration part à froid (cache de matchs, cache partagé, rapports mémoïsés et rate limiter neufs) et passe par
+analyze() : puuid -> IDs paginés -> fan-out des matchs -> agrégation -> scoring. Mesures : temps
+total, requêtes reçues par le serveur (dont 429), attente cumulée sur tous les workers (rate limiter
+et backoff), fenêtre de concurrence choisie (moyenne/max ; --workers = fenêtre de départ, ou fixe avec
+--fixed) et pic mémoire (tracemalloc). Avec --resp : commandes reçues par le faux Redis et verrous
+SET NX pris / refusés.
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import fake_resp
+import fake_riot
+
+def run_one(engine, cache, state, workdir, n_matches, workers, engine_name, settle, measure_memory, resp=None):
+    # Etat du moteur remis à zéro : chaque mesure est un scan à froid
+    path = os.path.join(workdir, f"bench_{engine_name}_{n_matches}_{workers}.sqlite3")
+    engine.MATCH_CACHE_PATH = path
+    engine._match_store = None
+    if resp:
+        resp_url, resp_state = resp
+        cache.configure(url=resp_url, local_path=path)
+        cache.get_backend().client.call("FLUSHDB")
+        resp_state.reset()
+    else:
+        cache.configure(url="", local_path=path)
+    engine.RATE_LIMITER = engine.RateLimiter(engine.DEFAULT_APP_RATE_LIMIT)
+    engine.MAX_WORKERS = engine.ASYNC_CONCURRENCY = workers
+    engine.CONCURRENCY = engine.ConcurrencyController(workers)
+    engine.HTTP = engine.make_http_session()
+    engine.REPORT_CACHE = engine.LRUCache(engine.REPORT_CACHE_MAX)  # Sinon même empreinte -> rapport mémoïsé, scoring sauté
+    engine.ASYNC_SCAN = engine_name == "async"
+    state.reset()
+
+    if measure_memory: tracemalloc.start()
+    t0 = time.perf_counter()
+    with engine.metrics.tracing() as trace:
+        report = engine.analyze("Bench#BNCH", "europe", 420, "bench-key", depth=n_matches)
+    wall = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1] if measure_memory else 0
+    if measure_memory: tracemalloc.stop()
+
+    info = trace.to_dict()
+    counters = info["counters"]
+    sleep = sum(v for k, v in counters.items() if k.startswith("sleep_seconds_total"))
+    conc = info.get("concurrency", {}).get("europe", {})
+    extra = {"cache_commands": dict(resp[1].commands), "cache_locks_won": resp[1].nx_won, "cache_locks_lost": resp[1].nx_lost} if resp else {}
+    return {**extra, "engine": engine_name, "matches": n_matches, "workers": workers, "settle": settle, "adaptive": engine.ADAPTIVE_CONCURRENCY,
+            "concurrency_mean": conc.get("mean", 0), "concurrency_max": conc.get("max", 0),
+            "scanned": report.matches_scanned, "verdict": report.verdict, "wall_s": round(wall, 3),
+            "requests": state.requests, "throttled": state.throttled, "by_endpoint": dict(state.by_endpoint),
+            "sleep_s": round(sleep, 3), "peak_mb": round(peak / 1e6, 2)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark du moteur de scan contre un faux serveur Riot.")
+    parser.add_argument("--matches", type=int, nargs="+", default=[10, 100, 500], help="Profondeurs d'historique à scanner")
+    parser.add_argument("--workers", type=int, nargs="+", default=[4, 8, 16], help="Concurrence de départ (MAX_WORKERS / ASYNC_CONCURRENCY)")
+    parser.add_argument("--fixed", action="store_true", help="Concurrence fixe (ADAPTIVE_CONCURRENCY=0) au lieu du contrôleur AIMD")
+    parser.add_argument("--engine", nargs="+", choices=["threads", "async"], default=["threads"])
+    parser.add_argument("--latency", type=float, default=0.05, help="Latence serveur par réponse (s)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Latence aléatoire ajoutée (s)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Proportion de 429 injectés")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--app-limit", default="20000:10", help="X-App-Rate-Limit annoncé par le serveur")
+    parser.add_argument("--fixtures", help="Réponses enregistrées à rejouer (cf. fake_riot.py)")
+    parser.add_argument("--settle", action="store_true", help="Garder l'arrêt anticipé des scans profonds (désactivé par défaut pour mesurer tout le fan-out)")
+    parser.add_argument("--no-memory", action="store_true", help="Sans tracemalloc (qui ralentit un peu les scans)")
+    parser.add_argument("--json", help="Ecrit les résultats dans ce fichier")
+    parser.add_argument("--resp", action="store_true", help="Cache partagé sur un faux Redis local (CACHE_URL -> fake_resp.py) au lieu de SQLite")
+    parser.add_argument("--verbose", action="store_true", help="Affiche les warnings du moteur (429, retries)")
+    args = parser.parse_args(argv)
+    logging.getLogger("boostlol").setLevel(logging.INFO if args.verbose else logging.ERROR)
+
+    server, state = fake_riot.start(0, latency=args.latency, jitter=args.jitter, rate_429=args.rate_429,
+                                    retry_after=args.retry_after, app_limit=args.app_limit, fixtures=args.fixtures)
+    resp_server, resp = None, None
+    if args.resp:
+        resp_server, resp_state = fake_resp.start(0)
+        resp = (f"redis://127.0.0.1:{resp_server.server_address[1]}/0", resp_state)
+    workdir = tempfile.mkdtemp(prefix="boostlol-bench-")
+    # Le moteur lit sa config à l'import : l'environnement doit être prêt avant
+    os.environ["RIOT_API_BASE"] = f"http://127.0.0.1:{server.server_address[1]}/{{region}}"
+    os.environ["MATCH_CACHE_PATH"] = os.path.join(workdir, "unused.sqlite3")
+    os.environ.pop("CACHE_URL", None)
+    import cache
+    import engine
+    if not args.settle:
+        engine.DuoAccumulator.settled = lambda self, remaining: False
+    engine.ADAPTIVE_CONCURRENCY = not args.fixed
+
+    results = []
+    print(f"{'engine':8}{'matches':>8}{'workers':>8}{'conc':>10}{'scanned':>8}{'wall s':>9}{'req':>6}{'429':>5}{'sleep s':>9}{'peak MB':>9}"
+          + (f"{'resp cmd':>10}{'NX won/lost':>13}" if resp else ""))
+    try:
+        for engine_name in args.engine:
+            for n in args.matches:
+                for w in args.workers:
+                    r = run_one(engine, cache, state, workdir, n, w, engine_name, args.settle, not args.no_memory, resp)
+                    results.append(r)
+                    conc = f"{r['concurrency_mean']:.0f}/{r['concurrency_max']}"
+                    locks = f"{r['cache_locks_won']}/{r['cache_locks_lost']}" if resp else ""
+                    print(f"{r['engine']:8}{r['matches']:>8}{r['workers']:>8}{conc:>10}{r['scanned']:>8}{r['wall_s']:>9.2f}{r['requests']:>6}{r['throttled']:>5}{r['sleep_s']:>9.2f}{r['peak_mb']:>9.1f}"
+                          + (f"{sum(r['cache_commands'].values()):>10}{locks:>13}" if resp else ""), flush=True)
+    finally:
+        server.shutdown()
+        if resp_server: resp_server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
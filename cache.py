@@ -0,0 +1,264 @@
+"""Cache partagé entre replicas pour les lookups Riot (puuid, comptes, listes d'IDs).
+
+    CACHE_URL=redis://[:motdepasse@]hôte:6379/0   -> serveur Redis (ou compatible RESP : KeyDB, Valkey...)
+    sans CACHE_URL                                -> table `kv` SQLite locale (partagée par les process d'une même machine)
+
+Le client Redis est minimal (protocole RESP sur socket, sans dépendance) : GET, SET PX [NX], DEL, AUTH, SELECT.
+shared_cache() ajoute des TTLs par type de lookup et une protection contre les stampedes : un
+seul appel à l'API par clé, les autres threads / replicas attendent le résultat.
+"""
+import functools
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from urllib.parse import unquote, urlsplit
+
+import metrics
+
+# --- PARAMETRES ---
+CACHE_URL = os.environ.get("CACHE_URL")
+CACHE_PREFIX = os.environ.get("CACHE_PREFIX", "boostlol:")
+LOCK_TTL = 10.0    # (s) Durée max d'un calcul avant que les autres replicas le refassent eux-mêmes
+LOCK_POLL = 0.05   # (s) Intervalle de polling du résultat quand un autre replica calcule
+
+# TTL (s) par type de lookup, surchargeable par CACHE_TTL_<TYPE> (ex. CACHE_TTL_MATCH_IDS=60)
+CACHE_TTLS = {
+    "puuid": 600,       # Un Riot ID peut être renommé
+    "account": 3600,    # puuid -> Riot ID (tag du duo)
+    "match_ids": 120,   # Une nouvelle partie peut arriver à tout moment
+}
+CACHE_TTLS.update({k: int(os.environ[f"CACHE_TTL_{k.upper()}"]) for k in CACHE_TTLS if f"CACHE_TTL_{k.upper()}" in os.environ})
+
+class CacheError(Exception):
+    """Backend injoignable ou réponse invalide : l'appelant retombe sur un appel direct à l'API."""
+
+# --- CLIENT RESP (REDIS) ---
+class RespClient:
+    """Client Redis minimal, une connexion par thread (pas de pipeline, pas de pub/sub)."""
+
+    def __init__(self, url, timeout=2.0):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 6379
+        self.password = unquote(parts.password) if parts.password else None
+        self.username = unquote(parts.username) if parts.username else None
+        self.db = int(parts.path.strip("/") or 0)
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.local.sock, self.local.rfile = sock, sock.makefile("rb")
+        try:
+            if self.password:
+                self._call(*(("AUTH", self.username, self.password) if self.username else ("AUTH", self.password)))
+            if self.db:
+                self._call("SELECT", str(self.db))
+        except CacheError:
+            self._close()  # Connexion non authentifiée : on ne la garde pas pour la commande suivante
+            raise
+
+    def _close(self):
+        sock = getattr(self.local, "sock", None)
+        self.local.sock = None
+        if sock:
+            try: sock.close()
+            except OSError: pass
+
+    def _read(self):
+        line = self.local.rfile.readline()
+        if not line.endswith(b"\r\n"): raise ConnectionError("connexion fermée par le serveur")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+": return body.decode()
+        if kind == b"-": raise CacheError(body.decode(errors="replace"))
+        if kind == b":": return int(body)
+        if kind == b"$":
+            n = int(body)
+            if n < 0: return None
+            data = self.local.rfile.read(n + 2)
+            if len(data) != n + 2: raise ConnectionError("réponse tronquée")
+            return data[:-2]
+        if kind == b"*":
+            n = int(body)
+            return None if n < 0 else [self._read() for _ in range(n)]
+        raise CacheError(f"réponse RESP inconnue: {line[:20]!r}")
+
+    def _call(self, *args):
+        out = [b"*%d\r\n" % len(args)]
+        for a in args:
+            a = a if isinstance(a, bytes) else str(a).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(a), a))
+        self.local.sock.sendall(b"".join(out))
+        return self._read()
+
+    def call(self, *args):
+        """Envoie une commande et renvoie la réponse décodée ; une reconnexion si le socket est mort."""
+        for attempt in (0, 1):
+            try:
+                if getattr(self.local, "sock", None) is None: self._connect()
+                return self._call(*args)
+            except OSError as e:
+                self._close()
+                if attempt: raise CacheError(str(e)) from e
+
+# --- BACKENDS ---
+class RedisCache:
+    def __init__(self, url):
+        self.client = RespClient(url)
+
+    def get(self, key):
+        return self.client.call("GET", key)
+
+    def set(self, key, value, ttl):
+        self.client.call("SET", key, value, "PX", int(ttl * 1000))
+
+    def add(self, key, value, ttl):
+        """SET NX PX : True si la clé n'existait pas (prise de verrou)."""
+        return self.client.call("SET", key, value, "NX", "PX", int(ttl * 1000)) == "OK"
+
+    def delete(self, key):
+        self.client.call("DEL", key)
+
+class SqliteCache:
+    """Même interface que RedisCache, sur une table SQLite (expiration vérifiée à la lecture)."""
+
+    PURGE_EVERY = 500  # Nb d'écritures entre deux purges des entrées expirées
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)")
+        self.db.commit()
+
+    def get(self, key):
+        with self.lock:
+            row = self.db.execute("SELECT value FROM kv WHERE key = ? AND expires > ?", (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)", (key, value, time.time() + ttl))
+            self.writes += 1
+            if self.writes % self.PURGE_EVERY == 0:
+                self.db.execute("DELETE FROM kv WHERE expires <= ?", (time.time(),))
+            self.db.commit()
+
+    def add(self, key, value, ttl):
+        now = time.time()
+        with self.lock:
+            self.db.execute("DELETE FROM kv WHERE key = ? AND expires <= ?", (key, now))
+            cur = self.db.execute("INSERT OR IGNORE INTO kv (key, value, expires) VALUES (?, ?, ?)", (key, value, now + ttl))
+            self.db.commit()
+        return cur.rowcount == 1
+
+    def delete(self, key):
+        with self.lock:
+            self.db.execute("DELETE FROM kv WHERE key = ?", (key,))
+            self.db.commit()
+
+# Erreurs de backend qui font retomber sur un appel direct (jamais d'échec du scan à cause du cache)
+BACKEND_ERRORS = (CacheError, sqlite3.Error)
+
+_backend = None
+_backend_lock = threading.Lock()
+_local_path = "match_cache.sqlite3"
+
+def configure(url=None, local_path=None):
+    """Change de backend (le moteur y passe MATCH_CACHE_PATH ; un benchmark peut pointer un serveur local)."""
+    global _backend, _local_path, CACHE_URL
+    with _backend_lock:
+        _backend = None
+        if url is not None: CACHE_URL = url
+        if local_path: _local_path = local_path
+
+def get_backend():
+    """Ouvert au premier lookup."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = RedisCache(CACHE_URL) if CACHE_URL else SqliteCache(_local_path)
+        return _backend
+
+# --- DECORATEUR ---
+def cache_key(kind, args):
+    # Hash : les arguments contiennent la clé API (les puuids sont chiffrés par clé), elle ne doit pas finir en clair
+    digest = hashlib.sha1(json.dumps(args, default=str).encode()).hexdigest()
+    return f"{CACHE_PREFIX}{kind}:{digest}"
+
+def shared_cache(kind):
+    """Mémoïsation partagée (TTL = CACHE_TTLS[kind]), None n'est jamais gardé (le prochain appel retente).
+
+    Anti-stampede à deux niveaux : un verrou par clé dans le process, puis un verrou SET NX PX
+    dans le backend. Celui qui l'obtient appelle l'API, les autres relisent le cache jusqu'au résultat
+    (ou jusqu'à LOCK_TTL, après quoi ils appellent l'API eux-mêmes). Backend en panne -> appel direct.
+    La clé ne dépend que des arguments positionnels : les arguments nommés (priority) passent à fn sans la changer.
+    """
+    def deco(fn):
+        locks = {}
+        locks_guard = threading.Lock()
+
+        def compute(key, args, kw):
+            ttl = CACHE_TTLS[kind]
+            backend = get_backend()
+            token = uuid.uuid4().hex
+            try:
+                owner = backend.add(key + ":lock", token, LOCK_TTL)
+                deadline = time.monotonic() + LOCK_TTL
+                while not owner and time.monotonic() < deadline:
+                    time.sleep(LOCK_POLL)
+                    raw = backend.get(key)
+                    if raw is not None: return json.loads(raw)
+                    owner = backend.add(key + ":lock", token, LOCK_TTL)
+            except BACKEND_ERRORS:
+                return fn(*args, **kw)
+            val = fn(*args, **kw)
+            try:
+                if val is not None: backend.set(key, json.dumps(val, separators=(",", ":")), ttl)
+                if owner: backend.delete(key + ":lock")
+            except BACKEND_ERRORS:
+                pass
+            return val
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kw):
+            key = cache_key(kind, args)
+            try:
+                raw = get_backend().get(key)
+                if raw is not None:
+                    metrics.incr("cache_hits_total", cache=kind)
+                    return json.loads(raw)
+            except BACKEND_ERRORS:
+                metrics.incr("cache_errors_total", cache=kind)
+                return fn(*args, **kw)
+            metrics.incr("cache_misses_total", cache=kind)
+            with locks_guard:
+                lock = locks.setdefault(key, threading.Lock())
+            with lock:
+                try:
+                    # Un autre thread du process vient peut-être de remplir la clé pendant qu'on attendait
+                    raw = get_backend().get(key)
+                    if raw is not None: return json.loads(raw)
+                except BACKEND_ERRORS:
+                    return fn(*args, **kw)
+                try:
+                    return compute(key, args, kw)
+                finally:
+                    with locks_guard:
+                        locks.pop(key, None)
+
+        def prime(value, *args):
+            """Pose une valeur déjà connue (ex. puuid du duo lu dans un match) sans appeler l'API."""
+            try: get_backend().set(cache_key(kind, args), json.dumps(value, separators=(",", ":")), CACHE_TTLS[kind])
+            except BACKEND_ERRORS: pass
+
+        wrapper.prime = prime
+        return wrapper
+    return deco
@@ -0,0 +1,1564 @@
+"""Moteur de scan headless : API Riot, caches, agrégation des duos, scoring et verdict.
+
+Aucune dépendance à Streamlit : utilisable depuis app.py, un worker, un benchmark ou batch.py.
+"""
+import asyncio
+import base64
+import concurrent.futures
+import contextlib
+import contextvars
+import hashlib
+import http.cookiejar
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass, field
+from urllib.parse import quote, urlsplit
+
+import numpy as np
+try:
+    import orjson  # Optionnel : décodage JSON 3-5x plus rapide sur les gros payloads match-v5
+except ImportError:
+    orjson = None
+import requests
+from requests.adapters import HTTPAdapter
+
+import baselines
+import cache
+import metrics
+
+log = logging.getLogger("boostlol")
+
+# --- PARAMETRES DE SCAN ---
+# Le RateLimiter ci-dessous suit le budget réel de la clé : plus besoin de brider à l'aveugle
+MATCH_COUNT = int(os.environ.get("MATCH_COUNT", 20))
+MAX_WORKERS = int(os.environ.get("MAX_WORKERS", 8))  # Fenêtre de départ (ou fixe si ADAPTIVE_CONCURRENCY=0) de requêtes en vol par région
+DEFAULT_APP_RATE_LIMIT = "20:1,100:120"  # Limites d'une clé de dev, remplacées par X-App-Rate-Limit dès la 1ère réponse
+RATE_LIMIT_SLACK = 0.2  # Marge (s) ajoutée à chaque fenêtre pour absorber la latence réseau
+ASYNC_SCAN = os.environ.get("ASYNC_SCAN", "0") == "1"  # Moteur asyncio au lieu du ThreadPoolExecutor
+ASYNC_CONCURRENCY = int(os.environ.get("ASYNC_CONCURRENCY", MAX_WORKERS))  # Idem pour le moteur async
+
+# --- CONCURRENCE ADAPTATIVE ---
+# La fenêtre de chaque région monte de ~1 par aller-retour tant que la clé a de la marge et que la latence
+# tient, et est divisée par deux sur un 429 : une clé de prod monte haut, une clé de dev reste basse
+ADAPTIVE_CONCURRENCY = os.environ.get("ADAPTIVE_CONCURRENCY", "1") == "1"
+MIN_CONCURRENCY = 2
+MAX_CONCURRENCY = int(os.environ.get("MAX_CONCURRENCY", 32))
+CONCURRENCY_HEADROOM = 0.25  # Part libre de la fenêtre app la plus chargée en dessous de laquelle on ne monte plus
+CONCURRENCY_LATENCY = 2.0    # Latence lissée / latence minimale observée au-delà de laquelle on ne monte plus
+
+# --- HISTORIQUE PROFOND ---
+MATCH_PAGE_SIZE = 100     # Max accepté par match-v5 /ids
+HISTORY_KEEP = 1000       # Nb max d'IDs gardés par (puuid, file) pour les scans suivants
+SETTLE_MIN_GAMES = 5      # Arrêt anticipé : le duo en tête doit avoir au moins ce nb de parties...
+SETTLE_Z = 3.0            # ... et une avance de SETTLE_Z écarts-types sur le 2e (test du signe)
+
+# --- PRIORITES ---
+# Quand le budget manque, les requêtes interactives (compte, IDs, MATCH_COUNT premiers matchs) passent
+# avant l'historique profond et le préchargement
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BACKGROUND: "background"}
+PRIORITY_POLL = 0.05  # (s) Re-vérification d'une requête qui cède la place à une plus prioritaire
+
+# --- PRECHARGEMENT DU DUO ---
+PREFETCH = os.environ.get("PREFETCH", "1") == "1"  # Après un scan, réchauffe l'historique du duo détecté
+PREFETCH_MIN_HEADROOM = 0.5  # Part du budget app (pire fenêtre) qui doit rester libre pour lancer une requête de préchargement
+
+# --- CACHE DISQUE DES MATCHS ---
+MATCH_CACHE_PATH = os.environ.get("MATCH_CACHE_PATH", "match_cache.sqlite3")
+MATCH_CACHE_MAX = int(os.environ.get("MATCH_CACHE_MAX", 20000))  # Nb max de matchs gardés (LRU)
+REPORT_CACHE_MAX = int(os.environ.get("REPORT_CACHE_MAX", 256))   # Nb max de DuoReport mémoïsés (LRU)
+# Lookups puuid / compte / IDs : Redis si CACHE_URL, sinon une table du même fichier SQLite (cf. cache.py)
+cache.configure(local_path=MATCH_CACHE_PATH)
+
+QUEUE_MAP = {
+    "Ranked Solo/Duo": 420,
+    "Ranked Flex": 440,
+    "Draft Normal": 400,
+    "ARAM": 450,
+    "Arena": 1700
+}
+
+ROUTING_REGIONS = ("europe", "asia", "americas", "sea")
+# Base des APIs Riot par région de routage ; un serveur local peut la remplacer (cf. bench/fake_riot.py),
+# ex. RIOT_API_BASE=http://127.0.0.1:8099/{region} (la région devient alors le 1er segment du chemin)
+RIOT_API_BASE = os.environ.get("RIOT_API_BASE", "https://{region}.api.riotgames.com")
+
+VERDICT_COLORS = {
+    "solid": "#00ff99", "survivor": "#FFD700", "tactician": "#00BFFF", "breacher": "#FFA500", "hyper": "#ff0055",
+    "feeder": "#ff4444", "passenger": "#888888", "struggle": "#ff4444", "solo": "#888"
+}
+
+class ScanError(Exception):
+    """Scan impossible (compte ou historique introuvable)."""
+
+class AccountNotFound(ScanError):
+    pass
+
+class NoGamesFound(ScanError):
+    pass
+
+def routing_region(region):
+    """Plateforme (EUW1, KR...) -> région de routage des APIs account-v1 / match-v5."""
+    if region in ROUTING_REGIONS: return region
+    if region in ["EUW1", "EUN1", "TR1", "RU"]: return "europe"
+    elif region == "KR": return "asia"
+    else: return "americas"
+
+class LRUCache:
+    """Dict borné thread-safe, éviction du moins récemment utilisé (rapports, rendus)."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.data: return None
+            self.data.move_to_end(key)
+            return self.data[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize: self.data.popitem(last=False)
+
+# --- RATE LIMITER (FENETRES APP + METHODE, PAR REGION) ---
+def parse_rate_limit(header):
+    """'20:1,100:120' -> [(20, 1), (100, 120)] (valeur:secondes, aussi valable pour les headers *-Count)."""
+    out = []
+    for part in (header or "").split(","):
+        try:
+            val, sec = part.split(":")
+            out.append((int(val), int(sec)))
+        except ValueError:
+            continue
+    return out
+
+def riot_url(region, path):
+    return RIOT_API_BASE.format(region=region) + path
+
+def split_riot_url(url):
+    """URL Riot -> (région de routage, endpoint), que la région soit dans le host ou dans le chemin."""
+    parts = urlsplit(url)
+    region = parts.hostname.split(".")[0]
+    if region in ROUTING_REGIONS: return region, method_key(url)
+    region, _, rest = parts.path.lstrip("/").partition("/")
+    return region, method_key("/" + rest)
+
+def method_key(url):
+    """Regroupe les URLs par endpoint Riot (les limites de méthode sont par endpoint, pas par ressource)."""
+    path = urlsplit(url).path
+    for prefix in ("/lol/match/v5/matches/by-puuid/", "/lol/match/v5/matches/", "/riot/account/v1/accounts/by-riot-id/", "/riot/account/v1/accounts/by-puuid/"):
+        if path.startswith(prefix): return prefix
+    return path
+
+class RateWindow:
+    """Une fenêtre 'limit requêtes / seconds', suivie par l'horodatage de chaque requête envoyée."""
+    __slots__ = ("limit", "seconds", "hits")
+
+    def __init__(self, limit, seconds):
+        self.limit = limit
+        self.seconds = seconds
+        self.hits = deque()
+
+    def prune(self, now):
+        horizon = now - self.seconds - RATE_LIMIT_SLACK
+        while self.hits and self.hits[0] <= horizon:
+            self.hits.popleft()
+
+    def wait_time(self, now):
+        self.prune(now)
+        if len(self.hits) < self.limit: return 0.0
+        return self.hits[len(self.hits) - self.limit] + self.seconds + RATE_LIMIT_SLACK - now
+
+    def sync(self, server_count, now):
+        # Le serveur compte aussi les autres replicas qui partagent la clé : on s'aligne sur le plus pessimiste
+        self.prune(now)
+        for _ in range(server_count - len(self.hits)):
+            self.hits.append(now)
+
+class RateLimiter:
+    """Budget partagé par tous les threads/sessions : fenêtres app et méthode, par région de routage.
+
+    Les limites sont apprises des headers X-App-Rate-Limit / X-Method-Rate-Limit ; acquire() bloque
+    jusqu'à ce qu'une requête rentre dans toutes les fenêtres, au lieu de subir un 429 puis dormir.
+    """
+
+    def __init__(self, default_app_limits):
+        self.lock = threading.Lock()
+        self.default_app_limits = parse_rate_limit(default_app_limits)
+        self.windows = {}        # (region,) ou (region, method) -> [RateWindow]
+        self.blocked_until = {}  # même clés -> instant de fin du Retry-After
+        self.waiting = {}        # (region, priorité) -> nb de requêtes en attente de budget
+
+    def _scopes(self, region, method):
+        if (region,) not in self.windows:
+            self.windows[(region,)] = [RateWindow(n, sec) for n, sec in self.default_app_limits]
+        return [(region,), (region, method)]
+
+    def reserve(self, region, method, priority=PRIORITY_INTERACTIVE):
+        """Prend un slot et renvoie 0 si la requête rentre dans le budget, sinon le temps à attendre avant de réessayer.
+
+        Une requête cède aussi la place tant qu'une requête plus prioritaire de la même région attend.
+        """
+        with self.lock:
+            now = time.monotonic()
+            scopes = self._scopes(region, method)
+            windows = [w for sc in scopes for w in self.windows.get(sc, [])]
+            wait = max([w.wait_time(now) for w in windows] + [self.blocked_until.get(sc, 0) - now for sc in scopes])
+            if any(self.waiting.get((region, p)) for p in range(priority)): wait = max(wait, PRIORITY_POLL)
+            if wait > 0: return wait
+            for w in windows: w.hits.append(now)
+            return 0.0
+
+    def headroom(self, region):
+        """Part libre (0-1) de la fenêtre app la plus chargée de la région, 0 pendant un Retry-After."""
+        with self.lock:
+            now = time.monotonic()
+            if self.blocked_until.get((region,), 0) > now: return 0.0
+            self._scopes(region, None)  # Crée les fenêtres app par défaut si la région n'a encore rien envoyé
+            free = []
+            for w in self.windows[(region,)]:
+                w.prune(now)
+                free.append(max(0, w.limit - len(w.hits)) / w.limit)
+            return min(free, default=1.0)
+
+    def _mark_waiting(self, region, priority, delta):
+        with self.lock:
+            self.waiting[(region, priority)] = self.waiting.get((region, priority), 0) + delta
+
+    def acquire(self, region, method, priority=PRIORITY_INTERACTIVE):
+        if (wait := self.reserve(region, method, priority)) <= 0: return
+        self._mark_waiting(region, priority, 1)
+        try:
+            while wait > 0:
+                metrics.incr("sleep_seconds_total", wait, reason="rate_limit", priority=PRIORITY_NAMES[priority])
+                time.sleep(wait)
+                wait = self.reserve(region, method, priority)
+        finally:
+            self._mark_waiting(region, priority, -1)
+
+    async def acquire_async(self, region, method, priority=PRIORITY_INTERACTIVE):
+        if (wait := self.reserve(region, method, priority)) <= 0: return
+        self._mark_waiting(region, priority, 1)
+        try:
+            while wait > 0:
+                metrics.incr("sleep_seconds_total", wait, reason="rate_limit", priority=PRIORITY_NAMES[priority])
+                await asyncio.sleep(wait)
+                wait = self.reserve(region, method, priority)
+        finally:
+            self._mark_waiting(region, priority, -1)
+
+    def update(self, region, method, headers, status):
+        with self.lock:
+            now = time.monotonic()
+            for scope, prefix in (((region,), "X-App-Rate-Limit"), ((region, method), "X-Method-Rate-Limit")):
+                limits = parse_rate_limit(headers.get(prefix))
+                if not limits: continue
+                old = {w.seconds: w for w in self.windows.get(scope, [])}
+                windows = []
+                for n, sec in limits:
+                    w = old.get(sec) or RateWindow(n, sec)
+                    w.limit = n
+                    windows.append(w)
+                self.windows[scope] = windows
+                counts = {sec: n for n, sec in parse_rate_limit(headers.get(prefix + "-Count"))}
+                for w in windows: w.sync(counts.get(w.seconds, 0), now)
+            if status == 429:
+                # Sans X-Rate-Limit-Type (limite "service"), on ne bloque que l'endpoint concerné
+                scope = (region,) if headers.get("X-Rate-Limit-Type") == "application" else (region, method)
+                try: retry = float(headers.get("Retry-After", 1))
+                except ValueError: retry = 1.0
+                metrics.incr("rate_limited_total", endpoint=method, type=headers.get("X-Rate-Limit-Type", "service"))
+                log.warning("429 sur %s (%s, %s) : pause de %.1fs", method, region, headers.get("X-Rate-Limit-Type", "service"), retry)
+                self.blocked_until[scope] = max(self.blocked_until.get(scope, 0), now + retry)
+
+# Une seule instance par process : toutes les sessions consomment le budget de la même clé
+RATE_LIMITER = RateLimiter(DEFAULT_APP_RATE_LIMIT)
+
+# --- CONCURRENCE ADAPTATIVE (AIMD PAR REGION) ---
+class ConcurrencyController:
+    """Nb de requêtes Riot en vol par région de routage, tous scans du process confondus, ajusté à chaque
+    réponse (cf. CONCURRENCE ADAPTATIVE).
+
+    Hausse additive (+1/fenêtre par réponse OK) si RATE_LIMITER.headroom() et la latence le permettent,
+    baisse multiplicative (x0.5) sur 429 ou erreur réseau, au plus une fois par aller-retour : les 429
+    d'une même rafale ne comptent qu'une fois. safe_request / async_request prennent une place avec
+    slot() / slot_async() : N scans simultanés se partagent la fenêtre au lieu d'en avoir une chacun.
+    """
+
+    def __init__(self, initial=None):
+        self.lock = threading.Condition()
+        self.initial = initial or MAX_WORKERS
+        self.regions = {}  # région -> {"limit", "in_flight", "rtt" (lissée), "base" (min), "cut_at"}
+
+    def _state(self, region):
+        if region not in self.regions:
+            self.regions[region] = {"limit": float(max(MIN_CONCURRENCY, min(MAX_CONCURRENCY, self.initial))), "in_flight": 0,
+                                    "rtt": None, "base": None, "cut_at": 0.0}
+        return self.regions[region]
+
+    def limit(self, region):
+        with self.lock:
+            return int(self._state(region)["limit"])
+
+    def _take(self, region):
+        """Prend une place si la fenêtre en a une (appelant sous self.lock)."""
+        st = self._state(region)
+        if st["in_flight"] >= int(st["limit"]): return False
+        st["in_flight"] += 1
+        return True
+
+    def _release(self, region):
+        with self.lock:
+            self._state(region)["in_flight"] -= 1
+            self.lock.notify_all()
+
+    @contextlib.contextmanager
+    def slot(self, region):
+        """Une place dans la fenêtre de la région le temps d'une requête (sans effet si ADAPTIVE_CONCURRENCY=0)."""
+        if not ADAPTIVE_CONCURRENCY:
+            yield
+            return
+        t0 = time.perf_counter()
+        with self.lock:
+            while not self._take(region): self.lock.wait()
+        if (waited := time.perf_counter() - t0) > 0.001: metrics.incr("sleep_seconds_total", waited, reason="concurrency")
+        try: yield
+        finally: self._release(region)
+
+    @contextlib.asynccontextmanager
+    async def slot_async(self, region):
+        """Equivalent asyncio de slot() : la boucle d'événements ne bloque jamais sur le verrou."""
+        if not ADAPTIVE_CONCURRENCY:
+            yield
+            return
+        t0 = time.perf_counter()
+        while True:
+            with self.lock:
+                if self._take(region): break
+            await asyncio.sleep(PRIORITY_POLL)
+        if (waited := time.perf_counter() - t0) > 0.001: metrics.incr("sleep_seconds_total", waited, reason="concurrency")
+        try: yield
+        finally: self._release(region)
+
+    def observe(self, region, seconds, status):
+        """Réponse reçue (status HTTP) ou échec réseau (status None) après `seconds`."""
+        headroom = RATE_LIMITER.headroom(region) if status == 200 else 0.0
+        with self.lock:
+            st = self._state(region)
+            now = time.monotonic()
+            old = int(st["limit"])
+            if status == 200:
+                st["rtt"] = seconds if st["rtt"] is None else 0.8 * st["rtt"] + 0.2 * seconds
+                st["base"] = seconds if st["base"] is None else min(st["base"], seconds)
+                if headroom >= CONCURRENCY_HEADROOM and st["rtt"] <= CONCURRENCY_LATENCY * max(st["base"], 0.001):
+                    st["limit"] = min(MAX_CONCURRENCY, st["limit"] + 1 / st["limit"])
+            elif status == 429 or status is None:
+                if now - st["cut_at"] >= max(1.0, st["rtt"] or 0):
+                    st["limit"] = max(MIN_CONCURRENCY, st["limit"] / 2)
+                    st["cut_at"] = now
+            new = int(st["limit"])
+            if new > old: self.lock.notify_all()
+        if new != old:
+            metrics.incr("concurrency_changes_total", region=region, direction="up" if new > old else "down")
+            metrics.gauge("concurrency_limit", new, region=region)
+
+CONCURRENCY = ConcurrencyController()
+
+def concurrency(region, fixed=None):
+    """Fenêtre de requêtes en vol pour cette région (fixed, ou MAX_WORKERS, si ADAPTIVE_CONCURRENCY=0)."""
+    return CONCURRENCY.limit(region) if ADAPTIVE_CONCURRENCY else (fixed or MAX_WORKERS)
+
+class ConcurrencyStats:
+    """Fenêtres utilisées par un scan, par région : ajoutées à sa Trace (panneau debug, log boostlol.scan, bench)."""
+
+    def __init__(self):
+        self.regions = {}  # région -> [nb de relevés, somme, min, max, dernière]
+
+    def record(self, region, limit):
+        s = self.regions.setdefault(region, [0, 0, limit, limit, limit])
+        s[0] += 1
+        s[1] += limit
+        s[2], s[3], s[4] = min(s[2], limit), max(s[3], limit), limit
+
+    def publish(self):
+        metrics.annotate(concurrency={r: {"mean": round(t / n, 1), "min": lo, "max": hi, "end": last} for r, (n, t, lo, hi, last) in self.regions.items()})
+
+# --- SESSION HTTP PARTAGEE (KEEP-ALIVE + GZIP) ---
+def make_http_session():
+    """Session unique du process : les connexions TLS vers chaque host sont réutilisées d'un match à l'autre."""
+    session = requests.Session()
+    # Un pool par host, dimensionné sur l'executor ; les retries sont gérés par safe_request
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=max(MAX_WORKERS, MAX_CONCURRENCY), max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)  # RIOT_API_BASE local (benchmarks)
+    session.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+    # Aucun cookie : la session est partagée entre threads et utilisateurs, elle ne doit garder aucun état
+    session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+HTTP = make_http_session()
+
+# --- API CORE (AVEC RETRY ROBUSTE) ---
+# Les URLs contiennent la clé API : on ne logue que l'endpoint (method_key) et la région
+def safe_request(url, priority=PRIORITY_INTERACTIVE):
+    region, method = split_riot_url(url)
+    retries = 3
+    for i in range(retries):
+        if i: metrics.incr("retries_total", endpoint=method)
+        RATE_LIMITER.acquire(region, method, priority)
+        t0 = time.perf_counter()
+        try:
+            with CONCURRENCY.slot(region):
+                t0 = time.perf_counter()  # Latence mesurée sans l'attente d'une place
+                resp = HTTP.get(url, timeout=5)
+        except requests.RequestException as e:
+            CONCURRENCY.observe(region, time.perf_counter() - t0, None)
+            metrics.incr("requests_total", endpoint=method, status=type(e).__name__)
+            log.warning("%s (%s) : %s, essai %d/%d", method, region, type(e).__name__, i + 1, retries)
+            metrics.incr("sleep_seconds_total", 1, reason="backoff")
+            time.sleep(1)
+            continue
+        metrics.incr("requests_total", endpoint=method, status=resp.status_code)
+        RATE_LIMITER.update(region, method, resp.headers, resp.status_code)
+        CONCURRENCY.observe(region, time.perf_counter() - t0, resp.status_code)
+        if resp.status_code == 200:
+            return resp
+        elif resp.status_code == 429: # RATE LIMIT : le limiter bloque la fenêtre jusqu'au Retry-After
+            continue
+        elif resp.status_code == 403: # FORBIDDEN (API KEY EXPIRED)
+            log.error("403 sur %s (%s) : clé API expirée ou invalide", method, region)
+            return None
+        else:
+            if resp.status_code != 404: log.warning("HTTP %d sur %s (%s)", resp.status_code, method, region)
+            return None
+    log.error("%s (%s) : abandon après %d essais", method, region, retries)
+    return None
+
+# --- COALESCENCE DES REQUETES EN VOL ---
+class RequestBroker:
+    """Single-flight par URL : des scans simultanés (joueurs d'une même premade) qui demandent le
+    même match n'envoient qu'une requête ; les suivants attendent le Future du premier.
+
+    Les Futures sont thread-safe : le moteur asyncio les attend via asyncio.wrap_future.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.inflight = {}  # URL -> concurrent.futures.Future (JSON décodé ou None)
+
+    def claim(self, url):
+        """(future, True) si l'appelant doit envoyer la requête, (future, False) s'il doit l'attendre."""
+        with self.lock:
+            fut = self.inflight.get(url)
+            if fut is not None: return fut, False
+            fut = self.inflight[url] = concurrent.futures.Future()
+            return fut, True
+
+    def resolve(self, url, fut, value):
+        with self.lock:
+            self.inflight.pop(url, None)
+        fut.set_result(value)
+
+BROKER = RequestBroker()
+
+def riot_get(url, priority=PRIORITY_INTERACTIVE, parse=None):
+    """GET Riot coalescé -> JSON décodé (puis parse(json) si fourni, une seule fois pour tous les appelants), ou None."""
+    fut, leader = BROKER.claim(url)
+    if not leader:
+        metrics.incr("coalesced_total", endpoint=split_riot_url(url)[1])
+        return fut.result()
+    value = None
+    try:
+        r = safe_request(url, priority)
+        value = loads(r.content) if r else None
+        if value is not None and parse: value = parse(value)
+    finally:
+        BROKER.resolve(url, fut, value)
+    return value
+
+@cache.shared_cache("puuid")
+def get_puuid(name, tag, region, api_key):
+    data = riot_get(riot_url(region, f"/riot/account/v1/accounts/by-riot-id/{name}/{tag}?api_key={api_key}"))
+    return data.get("puuid") if data else None
+
+@cache.shared_cache("account")
+def get_account_by_puuid(puuid, region, api_key, *, priority=PRIORITY_INTERACTIVE):
+    return riot_get(riot_url(region, f"/riot/account/v1/accounts/by-puuid/{puuid}?api_key={api_key}"), priority)
+
+@cache.shared_cache("match_ids")
+def get_match_id_page(puuid, region, api_key, q_id, start=0, count=MATCH_COUNT, start_time=None, end_time=None, *, priority=PRIORITY_INTERACTIVE):
+    window = (f"&startTime={start_time}" if start_time is not None else "") + (f"&endTime={end_time}" if end_time is not None else "")
+    return riot_get(riot_url(region, f"/lol/match/v5/matches/by-puuid/{puuid}/ids?queue={q_id}&start={start}&count={count}{window}&api_key={api_key}"), priority)
+
+def list_match_ids(puuid, region, api_key, q_id, depth=MATCH_COUNT, start_time=None, end_time=None, priority=PRIORITY_INTERACTIVE):
+    """IDs des `depth` derniers matchs (du plus récent au plus ancien), par pages de MATCH_PAGE_SIZE.
+
+    Sans fenêtre de temps, la liste connue d'un scan précédent est réutilisée : on ne pagine que
+    jusqu'à retomber sur son premier ID, le reste de l'historique n'a pas bougé.
+    Renvoie None si l'API ne répond pas et qu'aucune liste n'est connue.
+    """
+    store = get_match_store()
+    windowed = start_time is not None or end_time is not None
+    known = [] if windowed else store.get_history(puuid, q_id)
+    ids = []
+    while len(ids) < depth:
+        count = min(MATCH_PAGE_SIZE, depth - len(ids))
+        page = get_match_id_page(puuid, region, api_key, q_id, len(ids), count, start_time, end_time, priority=priority)
+        if page is None:
+            if not ids and not known: return None
+            ids += known
+            break
+        if known and known[0] in page:
+            # Les offsets restent alignés : on continue à paginer après la liste connue si elle est trop courte
+            ids += page[:page.index(known[0])] + known
+            known = []
+            continue
+        ids += page
+        if len(page) < count: break  # Fin de l'historique
+    if not windowed and ids: store.put_history(puuid, q_id, ids[:HISTORY_KEEP])
+    return ids[:depth]
+
+# --- MATCHS COMPACTS ---
+def loads(raw):
+    return orjson.loads(raw) if orjson else json.loads(raw)
+
+class Participant:
+    """Les ~18 champs d'un participant match-v5 que l'analyse lit (le payload en a plusieurs centaines)."""
+    __slots__ = ("puuid", "team", "win", "name", "tag", "champ", "champ_id", "role",
+                 "kills", "deaths", "assists", "dmg", "gold", "vis", "obj", "towers", "kp", "solokills")
+
+    @classmethod
+    def from_json(cls, p):
+        c = p.get('challenges') or {}
+        return cls.from_list([
+            p.get('puuid'), p.get('teamId', 0), bool(p.get('win', False)), p.get('riotIdGameName'), p.get('riotIdTagLine'),
+            p.get('championName', 'Unknown'), p.get('championId', 0), p.get('teamPosition', 'UNKNOWN'),
+            p.get('kills', 0), p.get('deaths', 0), p.get('assists', 0), p.get('totalDamageDealtToChampions', 0),
+            p.get('goldEarned', 0), p.get('visionScore', 0), p.get('damageDealtToObjectives', 0), p.get('turretTakedowns', 0),
+            c.get('killParticipation', 0), c.get('soloKills', 0)])
+
+    @classmethod
+    def from_list(cls, row):
+        p = cls.__new__(cls)
+        for k, v in zip(cls.__slots__, row): setattr(p, k, v)
+        return p
+
+    def to_list(self):
+        return [getattr(self, k) for k in self.__slots__]
+
+class MatchRecord:
+    """Match réduit à ce que l'agrégation utilise, extrait dès la réception (c'est lui qui est caché et
+    passé entre les étapes, jamais le payload complet). Sérialisé en liste JSON (~1 Ko au lieu de ~30)."""
+    __slots__ = ("match_id", "start", "duration", "queue", "participants")
+
+    def __init__(self, match_id, start, duration, queue, participants):
+        self.match_id = match_id
+        self.start = start        # Début de partie, epoch secondes
+        self.duration = duration  # Secondes
+        self.queue = queue
+        self.participants = participants
+
+    @classmethod
+    def from_json(cls, data):
+        """Payload match-v5 décodé -> MatchRecord, ou None si ce n'est pas un match."""
+        info = (data or {}).get('info')
+        if not info: return None
+        return cls(data.get('metadata', {}).get('matchId'),
+                   int(info.get('gameStartTimestamp', info.get('gameCreation', 0)) // 1000),
+                   info.get('gameDuration', 0), info.get('queueId', 0),
+                   [Participant.from_json(p) for p in info.get('participants', [])])
+
+    @classmethod
+    def from_list(cls, row):
+        return cls(*row[:4], [Participant.from_list(p) for p in row[4]])
+
+    def to_list(self):
+        return [self.match_id, self.start, self.duration, self.queue, [p.to_list() for p in self.participants]]
+
+# --- CACHE MATCHS PERSISTANT (SQLITE + ZLIB, EVICTION LRU) ---
+class MatchStore:
+    """Matchs sur disque (MatchRecord compacts) : une partie terminée ne change plus, on ne la télécharge qu'une fois."""
+
+    def __init__(self, path, max_entries):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS matches (match_id TEXT PRIMARY KEY, body BLOB NOT NULL, last_used REAL NOT NULL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS matches_last_used ON matches(last_used)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS scan_states (puuid TEXT NOT NULL, queue INTEGER NOT NULL, state BLOB NOT NULL, updated REAL NOT NULL, PRIMARY KEY (puuid, queue))")
+        self.db.execute("CREATE TABLE IF NOT EXISTS histories (puuid TEXT NOT NULL, queue INTEGER NOT NULL, ids TEXT NOT NULL, updated REAL NOT NULL, PRIMARY KEY (puuid, queue))")
+        self.db.commit()
+
+    def get(self, m_id):
+        with self.lock:
+            row = self.db.execute("SELECT body FROM matches WHERE match_id = ?", (m_id,)).fetchone()
+            if row is None: return None
+            self.db.execute("UPDATE matches SET last_used = ? WHERE match_id = ?", (time.time(), m_id))
+            self.db.commit()
+        data = loads(zlib.decompress(row[0]))
+        # Les lignes écrites avant les MatchRecord contiennent le payload complet
+        return MatchRecord.from_json(data) if isinstance(data, dict) else MatchRecord.from_list(data)
+
+    def put(self, m_id, record):
+        body = zlib.compress(json.dumps(record.to_list(), separators=(",", ":")).encode("utf-8"))
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO matches (match_id, body, last_used) VALUES (?, ?, ?)", (m_id, body, time.time()))
+            (count,) = self.db.execute("SELECT COUNT(*) FROM matches").fetchone()
+            if count > self.max_entries:
+                self.db.execute("DELETE FROM matches WHERE match_id IN (SELECT match_id FROM matches ORDER BY last_used LIMIT ?)", (count - self.max_entries,))
+            self.db.commit()
+
+    def iter_since(self, rowid, batch=500):
+        """(rowid, MatchRecord) des matchs insérés après `rowid`, dans l'ordre d'insertion (cf. baselines.py)."""
+        while True:
+            with self.lock:
+                rows = self.db.execute("SELECT rowid, body FROM matches WHERE rowid > ? ORDER BY rowid LIMIT ?", (rowid, batch)).fetchall()
+            if not rows: return
+            for rowid, body in rows:
+                data = loads(zlib.decompress(body))
+                yield rowid, MatchRecord.from_json(data) if isinstance(data, dict) else MatchRecord.from_list(data)
+
+    def get_history(self, puuid, q_id):
+        """Derniers IDs de matchs connus pour ce joueur et cette file (plus récent en premier)."""
+        with self.lock:
+            row = self.db.execute("SELECT ids FROM histories WHERE puuid = ? AND queue = ?", (puuid, q_id)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def put_history(self, puuid, q_id, ids):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO histories (puuid, queue, ids, updated) VALUES (?, ?, ?, ?)", (puuid, q_id, json.dumps(ids), time.time()))
+            self.db.commit()
+
+    def get_scan_state(self, puuid, q_id):
+        with self.lock:
+            row = self.db.execute("SELECT state FROM scan_states WHERE puuid = ? AND queue = ?", (puuid, q_id)).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def put_scan_state(self, puuid, q_id, state):
+        body = zlib.compress(json.dumps(state, separators=(",", ":")).encode("utf-8"))
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO scan_states (puuid, queue, state, updated) VALUES (?, ?, ?, ?)", (puuid, q_id, body, time.time()))
+            self.db.commit()
+
+_match_store = None
+_match_store_lock = threading.Lock()
+
+def get_match_store():
+    """Ouvert au premier usage (importer le moteur ne crée aucun fichier)."""
+    global _match_store
+    with _match_store_lock:
+        if _match_store is None:
+            _match_store = MatchStore(MATCH_CACHE_PATH, MATCH_CACHE_MAX)
+        return _match_store
+
+def fetch_match(m_id, region, api_key, priority=PRIORITY_INTERACTIVE):
+    t0 = time.perf_counter()
+    store = get_match_store()
+    data = store.get(m_id)
+    if data is not None:
+        metrics.incr("cache_hits_total", cache="match")
+        metrics.observe("fetch_match", time.perf_counter() - t0, source="cache")
+        return data
+    metrics.incr("cache_misses_total", cache="match")
+    data = riot_get(riot_url(region, f"/lol/match/v5/matches/{m_id}?api_key={api_key}"), priority, MatchRecord.from_json)
+    if data is not None: store.put(m_id, data)
+    metrics.observe("fetch_match", time.perf_counter() - t0, source="api")
+    return data
+
+# --- AGREGATION DUO ---
+# Colonnes numériques stockées par ligne de stats (une ligne = un joueur dans un match)
+STAT_COLS = ('kills', 'deaths', 'assists', 'dmg', 'gold', 'vis', 'obj', 'towers', 'kp', 'solokills', 'win', 'dmg_min', 'gold_min', 'vis_min')
+AVG_KEYS = STAT_COLS + ('kda',)
+COL = {k: i for i, k in enumerate(AVG_KEYS)}
+
+def stat_row(p, duration_min):
+    return [float(getattr(p, k)) for k in STAT_COLS[:11]] + [p.dmg / duration_min, p.gold / duration_min, p.vis / duration_min]
+
+class StatsTable:
+    """Lignes de stats en colonnes NumPy : un bloc float64 (STAT_COLS) + quelques colonnes entières nommées.
+
+    La capacité double quand elle est pleine, le coût mémoire reste ~15 floats par ligne.
+    """
+
+    def __init__(self, int_cols, cap=64):
+        self.n = 0
+        self.int_cols = {k: i for i, k in enumerate(int_cols)}
+        self.stats = np.zeros((cap, len(STAT_COLS)))
+        self.ints = np.zeros((cap, len(int_cols)), dtype=np.int64)
+
+    def append(self, stats, *ints):
+        if self.n == len(self.stats):
+            self.stats = np.concatenate([self.stats, np.zeros_like(self.stats)])
+            self.ints = np.concatenate([self.ints, np.zeros_like(self.ints)])
+        self.stats[self.n] = stats
+        self.ints[self.n] = ints
+        self.n += 1
+        return self.n - 1
+
+    @property
+    def rows(self):
+        return self.stats[:self.n]
+
+    def col(self, name):
+        return self.ints[:self.n, self.int_cols[name]]
+
+    def subset(self, mask):
+        """Nouvelle table limitée aux lignes où mask est vrai."""
+        out = StatsTable(self.int_cols, cap=max(64, int(mask.sum())))
+        out.n = int(mask.sum())
+        out.stats[:out.n] = self.rows[mask]
+        out.ints[:out.n] = self.ints[:self.n][mask]
+        return out
+
+    def to_state(self):
+        return {"n": self.n,
+                "stats": base64.b64encode(self.rows.tobytes()).decode("ascii"),
+                "ints": base64.b64encode(self.ints[:self.n].tobytes()).decode("ascii")}
+
+    @classmethod
+    def from_state(cls, int_cols, state):
+        out = cls(int_cols, cap=max(64, state["n"]))
+        out.n = state["n"]
+        out.stats[:out.n] = np.frombuffer(base64.b64decode(state["stats"]), dtype=np.float64).reshape(out.n, len(STAT_COLS))
+        out.ints[:out.n] = np.frombuffer(base64.b64decode(state["ints"]), dtype=np.int64).reshape(out.n, len(int_cols))
+        return out
+
+def with_kda(means):
+    """Ajoute la colonne KDA (calculée sur les moyennes kills/deaths/assists, arrondie à 2 décimales)."""
+    kda = np.round((means[:, COL['kills']] + means[:, COL['assists']]) / np.maximum(1, means[:, COL['deaths']]), 2)
+    return np.column_stack([means, kda])
+
+class DuoAccumulator:
+    """Agrégation incrémentale : duo en tête et games/wins à jour après chaque match.
+
+    Les stats sont gardées en colonnes (StatsTable) : une ligne par match pour la cible, une ligne
+    par (match, coéquipier) pour les coéquipiers. Les moyennes d'un duo se calculent d'un bloc sur ces
+    colonnes (averages), assez vite pour afficher un verdict provisoire après chaque match.
+    """
+
+    ME_COLS = ("champ", "role", "start")
+    PAIR_COLS = ("champ", "role", "mate", "match")
+
+    def __init__(self, puuid, total=0, depth=MATCH_COUNT):
+        self.puuid = puuid
+        self.total = total  # Nb de matchs attendus, pour afficher la progression
+        self.depth = depth  # Nb de parties couvertes par l'agrégat (les plus anciennes sont retirées au-delà)
+        self.done = 0
+        self.listed = total  # Nb d'IDs listés (< depth : tout l'historique du joueur tient dans l'agrégat)
+        self.seen = {}      # match ID -> début de partie (epoch s) des matchs déjà intégrés
+        self.failed = set() # IDs dont la récupération a échoué, redemandés au prochain scan incrémental
+        self.duo_data = {}  # puuid -> {'idx', 'name', 'tag', 'puuid', 'games', 'wins'}
+        self.mates = []     # idx -> même dict que duo_data
+        self.target_name = None
+        self.best_duo = None
+        self.max_g = 0
+        self.labels = []    # Champions et rôles encodés en entiers
+        self.codes = {}
+        self.champ_keys = {}  # championName -> championId (icônes résolues par id, cf. assets.py)
+        self.me = StatsTable(self.ME_COLS)
+        self.pairs = StatsTable(self.PAIR_COLS)
+
+    def code(self, label):
+        if label not in self.codes:
+            self.codes[label] = len(self.labels)
+            self.labels.append(label)
+        return self.codes[label]
+
+    def champ_code(self, p):
+        self.champ_keys.setdefault(p.champ, p.champ_id)
+        return self.code(p.champ)
+
+    def add(self, record, requested=None):
+        """Intègre un MatchRecord (None si la récupération de l'ID `requested` a échoué). Renvoie True si l'agrégat a changé."""
+        self.done += 1
+        if record is None:
+            if requested: self.failed.add(requested)
+            return False
+        m_id = record.match_id
+        self.failed.discard(m_id)
+        if m_id in self.seen: return False
+        start = record.start
+        if m_id: self.seen[m_id] = start
+        duration = record.duration
+        if duration < 300: return False
+        duration_min = duration / 60.0
+
+        parts = record.participants
+        me = next((p for p in parts if p.puuid == self.puuid), None)
+        if not me: return False
+        self.target_name = me.name or self.target_name
+        m = self.me.append(stat_row(me, duration_min), self.champ_code(me), self.code(me.role), start)
+
+        for p in parts:
+            if p.team == me.team and p.puuid != self.puuid:
+                # Clé = puuid : le Riot ID peut être complété après coup (resolve_duo_account)
+                gid = p.puuid
+                if gid not in self.duo_data:
+                    self.duo_data[gid] = {
+                        'idx': len(self.mates),
+                        'name': p.name,
+                        'tag': p.tag,
+                        'puuid': p.puuid,
+                        'games': 0, 'wins': 0
+                    }
+                    self.mates.append(self.duo_data[gid])
+                d = self.duo_data[gid]
+                d['games'] += 1
+                if p.win: d['wins'] += 1
+
+                self.pairs.append(stat_row(p, duration_min), self.champ_code(p), self.code(p.role), d['idx'], m)
+
+                if d['games'] > self.max_g: self.max_g = d['games']; self.best_duo = d
+        return True
+
+    def last_start(self):
+        """Début (epoch s) de la partie la plus récente déjà intégrée, 0 si aucune."""
+        return max(self.seen.values(), default=0)
+
+    def recount(self):
+        """Recalcule games/wins par coéquipier et le duo en tête à partir des tables."""
+        n = len(self.mates)
+        mate = self.pairs.col("mate")
+        games = np.bincount(mate, minlength=n)
+        wins = np.bincount(mate, weights=self.pairs.rows[:, COL['win']], minlength=n)
+        for d in self.mates:
+            d['games'], d['wins'] = int(games[d['idx']]), int(round(wins[d['idx']]))
+        self.max_g = int(games.max()) if n else 0
+        self.best_duo = self.mates[int(games.argmax())] if self.max_g else None
+
+    def trim(self, keep):
+        """Ne garde que les `keep` matchs les plus récents : l'agrégat reste une fenêtre glissante."""
+        if len(self.seen) <= keep: return
+        kept = sorted(self.seen.items(), key=lambda kv: kv[1], reverse=True)[:keep]
+        self.seen = dict(kept)
+        keep_me = self.me.col("start") >= kept[-1][1]
+        new_idx = np.cumsum(keep_me) - 1
+        keep_pair = keep_me[self.pairs.col("match")]
+        old_match = self.pairs.col("match")[keep_pair]
+        self.me = self.me.subset(keep_me)
+        self.pairs = self.pairs.subset(keep_pair)
+        self.pairs.ints[:self.pairs.n, self.pairs.int_cols["match"]] = new_idx[old_match]
+        self.done = self.total = len(self.seen)
+        self.recount()
+
+    def to_state(self):
+        """Etat sérialisable en JSON, pour reprendre l'agrégat au prochain scan (cf. plan_scan)."""
+        return {"puuid": self.puuid, "depth": self.depth, "done": self.done, "listed": self.listed, "failed": sorted(self.failed),
+                "target_name": self.target_name,
+                "seen": self.seen, "labels": self.labels, "champ_keys": self.champ_keys, "mates": self.mates,
+                "me": self.me.to_state(), "pairs": self.pairs.to_state()}
+
+    @classmethod
+    def from_state(cls, state):
+        acc = cls(state["puuid"], state["done"], state["depth"])
+        acc.done = state["done"]
+        acc.listed = state.get("listed", state["depth"])
+        acc.failed = set(state.get("failed", ()))
+        acc.target_name = state["target_name"]
+        acc.seen = state["seen"]
+        acc.labels = state["labels"]
+        acc.codes = {label: i for i, label in enumerate(acc.labels)}
+        acc.champ_keys = state.get("champ_keys", {})
+        acc.mates = state["mates"]
+        acc.duo_data = {d['puuid']: d for d in acc.mates}
+        acc.me = StatsTable.from_state(cls.ME_COLS, state["me"])
+        acc.pairs = StatsTable.from_state(cls.PAIR_COLS, state["pairs"])
+        acc.recount()
+        return acc
+
+    def settled(self, remaining):
+        """Vrai si le duo en tête ne peut plus être rattrapé par le 2e, ou s'il le devance nettement.
+
+        remaining : nb de matchs pas encore intégrés. Le test "net" est un test du signe
+        (écart / sqrt(total) >= SETTLE_Z) sur les parties du 1er et du 2e coéquipier. Jamais avant
+        MATCH_COUNT matchs intégrés : le rapport couvre au moins autant de parties qu'un scan standard.
+        """
+        if len(self.seen) < MATCH_COUNT or not self.best_duo: return False
+        a = self.max_g
+        b = max((d['games'] for d in self.mates if d is not self.best_duo), default=0)
+        if a - b > remaining: return True
+        return a >= SETTLE_MIN_GAMES and (a - b) / math.sqrt(a + b) >= SETTLE_Z
+
+    def averages(self, d):
+        """(moyennes cible, moyennes duo, écarts cible - duo) sur les parties jouées ensemble, en dicts."""
+        mask = self.pairs.col("mate") == d['idx']
+        duo = with_kda(self.pairs.rows[mask].mean(axis=0, keepdims=True))[0]
+        me = with_kda(self.me.rows[self.pairs.col("match")[mask]].mean(axis=0, keepdims=True))[0]
+        return dict(zip(AVG_KEYS, me.tolist())), dict(zip(AVG_KEYS, duo.tolist())), dict(zip(AVG_KEYS, (me - duo).tolist()))
+
+    def top_labels(self, d, column, side, k):
+        """Les k valeurs les plus fréquentes (champions ou rôles) de la cible (side='me') ou du duo avec ce coéquipier."""
+        mask = self.pairs.col("mate") == d['idx']
+        codes = self.me.col(column)[self.pairs.col("match")[mask]] if side == "me" else self.pairs.col(column)[mask]
+        counts = np.bincount(codes, minlength=len(self.labels))
+        order = np.argsort(-counts, kind="stable")[:k]
+        return [self.labels[c] for c in order if counts[c] > 0]
+
+def plan_scan(puuid, region, api_key, q_id, depth=MATCH_COUNT, start_time=None, end_time=None):
+    """Accumulateur de départ + IDs des matchs à récupérer.
+
+    Sans fenêtre de temps, l'agrégat du scan précédent du joueur est repris s'il couvre au moins
+    `depth` parties (ou tout son historique, s'il est plus court), échecs compris : on ne demande que
+    les matchs commencés après sa partie la plus récente, plus ceux dont la récupération avait échoué.
+    """
+    windowed = start_time is not None or end_time is not None
+    state = None if windowed else get_match_store().get_scan_state(puuid, q_id)
+    acc = DuoAccumulator.from_state(state) if state else None
+    if acc and len(acc.seen) + len(acc.failed) >= (min(depth, acc.listed) if acc.listed < acc.depth else depth):
+        new_ids = list_match_ids(puuid, region, api_key, q_id, depth, start_time=acc.last_start() + 1) or []
+        new_ids = [m for m in new_ids if m not in acc.seen]
+        retry = [m for m in sorted(acc.failed) if m not in acc.seen and m not in new_ids]
+        acc.failed = set()
+        acc.depth = max(acc.depth, depth)
+        acc.listed += len(new_ids)
+        acc.done = len(acc.seen)
+        acc.total = acc.done + len(new_ids) + len(retry)
+        return acc, new_ids + retry
+    match_ids = list_match_ids(puuid, region, api_key, q_id, depth, start_time, end_time)
+    return DuoAccumulator(puuid, len(match_ids or []), depth), match_ids
+
+def finish_scan(acc, q_id, depth, start_time=None, end_time=None):
+    """Sauve l'agrégat pour le prochain scan incrémental, puis le ramène à `depth` parties."""
+    if start_time is None and end_time is None:
+        acc.trim(acc.depth)
+        get_match_store().put_scan_state(acc.puuid, q_id, acc.to_state())
+    acc.trim(depth)
+
+def resolve_duo_account(acc, region, api_key):
+    """Complète le Riot ID du duo en tête quand le match ne donne pas le tag (anciens comptes)."""
+    best_duo = acc.best_duo
+    if best_duo and acc.max_g >= 2 and (not best_duo['tag'] or best_duo['tag'] == "None"):
+        acc_data = get_account_by_puuid(best_duo['puuid'], region, api_key)
+        if acc_data:
+            best_duo['name'] = acc_data.get('gameName', best_duo['name'])
+            best_duo['tag'] = acc_data.get('tagLine', best_duo['tag'])
+
+def match_priority(i):
+    """Les MATCH_COUNT premiers matchs d'un scan sont interactifs, l'historique profond passe en arrière-plan."""
+    return PRIORITY_INTERACTIVE if i < MATCH_COUNT else PRIORITY_BACKGROUND
+
+def scan_threads(name, tag, region, q_id, api_key, on_progress=None, depth=MATCH_COUNT, start_time=None, end_time=None):
+    """puuid -> IDs -> fan-out des matchs sur un pool de threads. Renvoie le DuoAccumulator final.
+
+    Les matchs sont soumis au fil de l'eau, jamais plus que concurrency(region) à la fois. En historique
+    profond (depth > MATCH_COUNT), le scan arrête d'en demander dès que acc.settled().
+    """
+    with metrics.span("puuid"):
+        puuid = get_puuid(name, tag, region, api_key)
+    if not puuid: raise AccountNotFound(f"{name}#{tag}")
+    with metrics.span("match_ids"):
+        acc, match_ids = plan_scan(puuid, region, api_key, q_id, depth, start_time, end_time)
+    if not match_ids and not acc.done: raise NoGamesFound(f"{name}#{tag}")
+
+    settle = depth > MATCH_COUNT  # Scan standard : toujours les MATCH_COUNT parties, pour des moyennes stables
+    pending = enumerate(match_ids)
+    in_flight = {}  # future -> match ID
+    stats = ConcurrencyStats()
+    # concurrency() borne les matchs soumis par ce scan (relu à chaque complétion) ; CONCURRENCY.slot() borne
+    # les requêtes en vol de la région pour tous les scans, le RATE_LIMITER borne le débit
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_CONCURRENCY if ADAPTIVE_CONCURRENCY else MAX_WORKERS) as executor:
+        def refill():
+            limit = concurrency(region)
+            stats.record(region, limit)
+            for i, m in pending:
+                # copy_context : les spans et compteurs du thread vont dans la Trace de ce scan
+                in_flight[executor.submit(contextvars.copy_context().run, fetch_match, m, region, api_key, match_priority(i))] = m
+                if len(in_flight) >= limit: return
+
+        refill()
+        while in_flight:
+            done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                m_id = in_flight.pop(future)
+                try:
+                    with metrics.span("aggregate"):
+                        changed = acc.add(future.result(), m_id)
+                    if changed and on_progress: on_progress(acc)
+                except Exception:
+                    acc.failed.add(m_id)
+                    log.exception("Match ignoré (%s)", region)
+            if not (settle and acc.settled(acc.total - acc.done)): refill()
+    stats.publish()
+    with metrics.span("finish"):
+        resolve_duo_account(acc, region, api_key)
+        finish_scan(acc, q_id, depth, start_time, end_time)
+    return acc
+
+# --- MOTEUR ASYNC (ALTERNATIVE AU THREADPOOL) ---
+async def async_request(http, url, priority=PRIORITY_INTERACTIVE):
+    """Equivalent asyncio de safe_request : même RATE_LIMITER, renvoie le JSON décodé ou None."""
+    import aiohttp
+    region, method = split_riot_url(url)
+    for i in range(3):
+        if i: metrics.incr("retries_total", endpoint=method)
+        await RATE_LIMITER.acquire_async(region, method, priority)
+        t0 = time.perf_counter()
+        try:
+            async with CONCURRENCY.slot_async(region):
+                t0 = time.perf_counter()
+                async with http.get(url, timeout=aiohttp.ClientTimeout(total=5)) as resp:
+                    metrics.incr("requests_total", endpoint=method, status=resp.status)
+                    RATE_LIMITER.update(region, method, resp.headers, resp.status)
+                    body = await resp.read() if resp.status == 200 else None
+                    CONCURRENCY.observe(region, time.perf_counter() - t0, resp.status)
+                if resp.status == 200: return loads(body)
+                if resp.status == 429: continue
+                if resp.status != 404: log.warning("HTTP %d sur %s (%s)", resp.status, method, region)
+                return None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            CONCURRENCY.observe(region, time.perf_counter() - t0, None)
+            metrics.incr("requests_total", endpoint=method, status=type(e).__name__)
+            log.warning("%s (%s) : %s, essai %d/3", method, region, type(e).__name__, i + 1)
+            metrics.incr("sleep_seconds_total", 1, reason="backoff")
+            await asyncio.sleep(1)
+    log.error("%s (%s) : abandon après 3 essais", method, region)
+    return None
+
+async def async_get(http, url, priority=PRIORITY_INTERACTIVE, parse=None):
+    """Equivalent asyncio de riot_get : même BROKER, donc coalescé aussi avec les scans threads."""
+    fut, leader = BROKER.claim(url)
+    if not leader:
+        metrics.incr("coalesced_total", endpoint=split_riot_url(url)[1])
+        return await asyncio.wrap_future(fut)
+    value = None
+    try:
+        value = await async_request(http, url, priority)
+        if value is not None and parse: value = parse(value)
+    finally:
+        BROKER.resolve(url, fut, value)
+    return value
+
+async def scan_async(name, tag, region, q_id, api_key, on_progress=None, depth=MATCH_COUNT, start_time=None, end_time=None):
+    """puuid -> IDs -> détails des matchs -> compte du duo, en un seul graphe de coroutines à concurrence bornée.
+
+    on_progress(acc) est appelé après chaque match intégré. Renvoie le DuoAccumulator final.
+    """
+    import aiohttp  # ~0.2 s d'import, seulement pour le moteur async (ASYNC_SCAN=1)
+    store = get_match_store()
+    connector = aiohttp.TCPConnector(limit_per_host=MAX_CONCURRENCY if ADAPTIVE_CONCURRENCY else ASYNC_CONCURRENCY)
+    async with aiohttp.ClientSession(connector=connector, headers={"Accept-Encoding": "gzip, deflate"}) as http:
+        # puuid via le cache partagé entre replicas (cf. cache.py)
+        with metrics.span("puuid"):
+            puuid = await asyncio.to_thread(get_puuid, name, tag, region, api_key)
+        if not puuid: raise AccountNotFound(f"{name}#{tag}")
+        # Pagination, historique connu et reprise incrémentale partagés avec le moteur threads (quelques requêtes, hors boucle)
+        with metrics.span("match_ids"):
+            acc, match_ids = await asyncio.to_thread(plan_scan, puuid, region, api_key, q_id, depth, start_time, end_time)
+        if not match_ids and not acc.done: raise NoGamesFound(f"{name}#{tag}")
+
+        async def load(m_id, priority):
+            t0 = time.perf_counter()
+            # SQLite + verrou du store : hors de la boucle d'événements
+            data = await asyncio.to_thread(store.get, m_id)
+            if data is not None:
+                metrics.incr("cache_hits_total", cache="match")
+                metrics.observe("fetch_match", time.perf_counter() - t0, source="cache")
+                return data
+            metrics.incr("cache_misses_total", cache="match")
+            data = await async_get(http, riot_url(region, f"/lol/match/v5/matches/{m_id}?api_key={api_key}"), priority, MatchRecord.from_json)
+            if data is not None: await asyncio.to_thread(store.put, m_id, data)
+            metrics.observe("fetch_match", time.perf_counter() - t0, source="api")
+            return data
+
+        settle = depth > MATCH_COUNT
+        pending = enumerate(match_ids)
+        in_flight = {}  # tâche -> match ID
+        stats = ConcurrencyStats()
+
+        def refill():
+            limit = concurrency(region, ASYNC_CONCURRENCY)
+            stats.record(region, limit)
+            for i, m in pending:
+                in_flight[asyncio.ensure_future(load(m, match_priority(i)))] = m
+                if len(in_flight) >= limit: return
+
+        refill()
+        while in_flight:
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                m_id = in_flight.pop(task)
+                try:
+                    with metrics.span("aggregate"):
+                        changed = acc.add(task.result(), m_id)
+                    if changed and on_progress: on_progress(acc)
+                except Exception:
+                    acc.failed.add(m_id)
+                    log.exception("Match ignoré (%s)", region)
+            if not (settle and acc.settled(acc.total - acc.done)): refill()
+
+    stats.publish()
+    with metrics.span("finish"):
+        await asyncio.to_thread(resolve_duo_account, acc, region, api_key)
+        await asyncio.to_thread(finish_scan, acc, q_id, depth, start_time, end_time)
+    return acc
+
+def scan_sync(name, tag, region, q_id, api_key, on_progress=None, depth=MATCH_COUNT, start_time=None, end_time=None):
+    """Wrapper synchrone de scan_async pour le script Streamlit et les appelants non-async."""
+    return asyncio.run(scan_async(name, tag, region, q_id, api_key, on_progress, depth, start_time, end_time))
+
+# --- LOGIQUE SCORE ---
+# Index de percentiles (baselines.py) : les moyennes d'un joueur sont jugées contre celles des joueurs de
+# son rôle dans sa file. Sans table assez fournie, les barèmes fixes ci-dessous s'appliquent
+BADGE_TOP = 0.85     # Percentile à partir duquel une stat vaut un badge
+BADGE_BOTTOM = 0.15  # Percentile sous lequel elle vaut un défaut
+
+def score(s, r, queue=None):
+    t = baselines.lookup(queue, r)
+    if t:
+        # Mêmes poids que le barème fixe (max 20) ; le support n'est pas jugé sur ses dégâts
+        sc = 5 * t.pct('kda', s['kda']) + 4 * t.pct('kp', s['kp']) + 3 * t.pct('vis_min', s['vis_min'])
+        sc += 4 * t.pct('dmg_min', s['dmg_min']) if r != "UTILITY" else 0
+        return sc + 2 * t.pct('obj', s['obj']) + 2 * t.pct('towers', s['towers'])
+    sc = min(5, s['kda']) + (s['kp']*4) + min(3, (s['vis_min']/(2.0 if r=="UTILITY" else 1.0))*2)
+    sc += min(4, s['dmg_min']/700) if r!="UTILITY" else 0
+    return sc + min(4, (s['obj']/5000) + (s['towers']*0.5))
+
+def pick_verdict(avg_me, avg_duo, r_me, r_duo, queue=None):
+    """Clé de verdict (v_<clé> / s_<clé> dans les traductions) et ratio des scores cible/duo."""
+    ratio = score(avg_me, r_me, queue) / max(0.1, score(avg_duo, r_duo, queue))
+
+    t_me, t_duo = baselines.lookup(queue, r_me), baselines.lookup(queue, r_duo)
+    if t_me and t_duo:
+        # Ecarts de percentile : comparables d'une stat à l'autre et d'un rôle à l'autre
+        diff_kda, diff_dmg, diff_vis, diff_obj = (t_me.pct(k, avg_me[k]) - t_duo.pct(k, avg_duo[k]) for k in ('kda', 'dmg_min', 'vis_min', 'obj'))
+    else:
+        diff_kda = (avg_me['kda'] - avg_duo['kda']) / 1.5
+        diff_dmg = (avg_me['dmg_min'] - avg_duo['dmg_min']) / 400
+        diff_vis = (avg_me['vis_min'] - avg_duo['vis_min']) / 0.8
+        diff_obj = (avg_me['obj'] - avg_duo['obj']) / 3000
+
+    verdict = "solid"
+    if ratio > 1.15:
+        max_diff = max(diff_kda, diff_dmg, diff_vis, diff_obj)
+        if max_diff == diff_kda: verdict = "survivor"
+        elif max_diff == diff_vis: verdict = "tactician"
+        elif max_diff == diff_obj: verdict = "breacher"
+        else: verdict = "hyper"
+    elif ratio < 0.85:
+        min_diff = min(diff_kda, diff_dmg, diff_vis)
+        if min_diff == diff_kda: verdict = "feeder"
+        elif min_diff == diff_dmg: verdict = "passenger"
+        else: verdict = "struggle"
+    return verdict, ratio
+
+def determine_playstyle(stats, role, lang_dict=None, queue=None):
+    lang_dict = lang_dict or {}
+    t = baselines.lookup(queue, role)
+    if t: return playstyle_from_baseline(stats, t, lang_dict, role)
+    badges = []
+    kda = stats.get('kda', 0)
+    vis = stats.get('vis_min', 0)
+    kp = stats.get('kp', 0)
+    dmg = stats.get('dmg_min', 0)
+    obj = stats.get('obj', 0)
+    sk = stats.get('solokills', 0)
+
+    if kda >= 4.0: badges.append((lang_dict.get("q_surv", "Survival"), "b-gold"))
+    if vis >= 2.0 or (role == "UTILITY" and vis >= 2.5): badges.append((lang_dict.get("q_vis", "Oracle"), "b-blue"))
+    if kp >= 0.65: badges.append(("Teamplayer", "b-green"))
+    if dmg >= 800: badges.append((lang_dict.get("q_dmg", "Damage"), "b-red"))
+    if sk >= 2.5: badges.append(("Duelist", "b-red"))
+    if obj >= 5000: badges.append((lang_dict.get("q_obj", "Breacher"), "b-gold"))
+
+    if kda < 1.5: badges.append((lang_dict.get("f_feed", "Grey Screen"), "b-red"))
+    if vis < 0.4 and role != "ADC": badges.append((lang_dict.get("f_blind", "Blind"), "b-red"))
+    if dmg < 300 and role not in ["UTILITY", "JUNGLE"]: badges.append((lang_dict.get("f_afk", "AFK"), "b-blue"))
+
+    if not badges: badges.append(("Standard", "b-blue"))
+    return badges[:3]
+
+def playstyle_from_baseline(stats, t, lang_dict, role=None):
+    """Badges de determine_playstyle, seuils en percentiles du rôle (BADGE_TOP / BADGE_BOTTOM) au lieu de valeurs fixes.
+
+    Avec la table de toute la file (t.role == "ALL"), les exceptions par rôle des barèmes fixes restent :
+    pas d'AFK pour support/jungle, pas de Blind pour l'ADC, Oracle du support au-delà de 2.5 vision/min.
+    """
+    p = {k: t.pct(k, stats.get(k, 0)) for k in ('kda', 'vis_min', 'kp', 'dmg_min', 'solokills', 'obj')}
+    generic = t.role == "ALL"
+    badges = []
+    if p['kda'] >= BADGE_TOP: badges.append((lang_dict.get("q_surv", "Survival"), "b-gold"))
+    if p['vis_min'] >= BADGE_TOP and not (generic and role == "UTILITY" and stats.get('vis_min', 0) < 2.5):
+        badges.append((lang_dict.get("q_vis", "Oracle"), "b-blue"))
+    if p['kp'] >= BADGE_TOP: badges.append(("Teamplayer", "b-green"))
+    if p['dmg_min'] >= BADGE_TOP: badges.append((lang_dict.get("q_dmg", "Damage"), "b-red"))
+    if p['solokills'] >= BADGE_TOP and stats.get('solokills', 0) >= 1: badges.append(("Duelist", "b-red"))
+    if p['obj'] >= BADGE_TOP: badges.append((lang_dict.get("q_obj", "Breacher"), "b-gold"))
+
+    if p['kda'] < BADGE_BOTTOM: badges.append((lang_dict.get("f_feed", "Grey Screen"), "b-red"))
+    if p['vis_min'] < BADGE_BOTTOM and not (generic and role in ("BOTTOM", "ADC")): badges.append((lang_dict.get("f_blind", "Blind"), "b-red"))
+    if p['dmg_min'] < BADGE_BOTTOM and not (generic and role in ("UTILITY", "JUNGLE")): badges.append((lang_dict.get("f_afk", "AFK"), "b-blue"))
+
+    if not badges: badges.append(("Standard", "b-blue"))
+    return badges[:3]
+
+def radar_values(s, role=None, queue=None):
+    """Stats moyennes -> 5 axes du radar (Combat, Gold, Vision, Objectifs, Survie) sur 0-100 (percentiles du rôle si indexé)."""
+    t = baselines.lookup(queue, role)
+    if t: return [100 * t.pct(k, s.get(k, 0)) for k in ('dmg_min', 'gold_min', 'vis_min', 'obj', 'kda')]
+    def norm(val, max_v): return min(100, (val / max_v) * 100)
+    return [norm(s.get('dmg_min',0), 1000), norm(s.get('gold_min',0), 600), norm(s.get('vis_min',0), 2.5), norm(s.get('obj',0), 8000), norm(s.get('kda',0), 5)]
+
+# --- RAPPORT ---
+@dataclass
+class DuoReport:
+    """Résultat d'un scan, sans aucune mise en forme : le rendu (Streamlit, JSON, CSV) se fait à partir de ça."""
+    riot_id: str
+    region: str
+    queue: int
+    target_name: str
+    matches_scanned: int = 0
+    matches_total: int = 0
+    final: bool = True
+    verdict: str = "solo"
+    duo_name: str = None
+    duo_tag: str = None
+    duo_puuid: str = None
+    games: int = 0
+    wins: int = 0
+    winrate: int = 0
+    role_me: str = "UNKNOWN"
+    role_duo: str = "UNKNOWN"
+    champs_me: list = field(default_factory=list)
+    champs_duo: list = field(default_factory=list)
+    champ_keys_me: list = field(default_factory=list)   # championId de chaque champs_me (0 si inconnu)
+    champ_keys_duo: list = field(default_factory=list)
+    avg_me: dict = field(default_factory=dict)
+    avg_duo: dict = field(default_factory=dict)
+    diff: dict = field(default_factory=dict)  # avg_me - avg_duo
+    ratio: float = 0.0
+    radar_me: list = field(default_factory=list)
+    radar_duo: list = field(default_factory=list)
+    fingerprint: str = None  # Empreinte (puuid, file, IDs des matchs agrégés) : clé des caches de rapport et de rendu
+
+    @property
+    def has_duo(self):
+        return self.verdict != "solo"
+
+    @property
+    def duo_full_id(self):
+        return f"{self.duo_name}#{self.duo_tag}"
+
+    @property
+    def color(self):
+        return VERDICT_COLORS[self.verdict]
+
+    def to_dict(self):
+        return asdict(self)
+
+def build_report(acc, riot_id, region, q_id, final=True):
+    """DuoAccumulator -> DuoReport (pur calcul, aucun appel réseau)."""
+    report = DuoReport(riot_id=riot_id, region=region, queue=q_id, target_name=acc.target_name or riot_id,
+                       matches_scanned=acc.done, matches_total=acc.total, final=final)
+    best_duo = acc.best_duo
+    if not best_duo or acc.max_g < 2: return report
+
+    g = best_duo['games']
+    r_duo = (acc.top_labels(best_duo, "role", "duo", 1) or ["UNKNOWN"])[0]
+    r_me = (acc.top_labels(best_duo, "role", "me", 1) or ["UNKNOWN"])[0]
+
+    avg_me, avg_duo, diff = acc.averages(best_duo)
+    verdict, ratio = pick_verdict(avg_me, avg_duo, r_me, r_duo, q_id)
+
+    report.verdict = verdict
+    report.ratio = ratio
+    report.duo_name = best_duo['name']
+    report.duo_tag = best_duo['tag']
+    report.duo_puuid = best_duo['puuid']
+    report.games = g
+    report.wins = best_duo['wins']
+    report.winrate = int((best_duo['wins']/g)*100)
+    report.role_me, report.role_duo = r_me, r_duo
+    report.champs_me = acc.top_labels(best_duo, "champ", "me", 3)
+    report.champs_duo = acc.top_labels(best_duo, "champ", "duo", 3)
+    report.champ_keys_me = [acc.champ_keys.get(c, 0) for c in report.champs_me]
+    report.champ_keys_duo = [acc.champ_keys.get(c, 0) for c in report.champs_duo]
+    report.avg_me, report.avg_duo, report.diff = avg_me, avg_duo, diff
+    report.radar_me, report.radar_duo = radar_values(avg_me, r_me, q_id), radar_values(avg_duo, r_duo, q_id)
+    return report
+
+def scan_fingerprint(acc, q_id):
+    """Hash des entrées exactes d'un rapport : même joueur, même file, mêmes matchs, même index de percentiles -> même verdict."""
+    payload = json.dumps([acc.puuid, q_id, sorted(acc.seen), baselines.version()], separators=(",", ":"))
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+# Rapports finaux déjà calculés : un rerun Streamlit sans nouvelle partie ne refait ni scoring ni verdict
+REPORT_CACHE = LRUCache(REPORT_CACHE_MAX)
+
+def analyze(riot_id, region, queue, api_key=None, on_progress=None, depth=None, start_time=None, end_time=None):
+    """Scan complet d'un Riot ID -> DuoReport.
+
+    region : plateforme (EUW1, KR...) ou région de routage ; queue : id de file ou libellé de QUEUE_MAP.
+    depth : nb max de parties (MATCH_COUNT par défaut) ; start_time / end_time : fenêtre en epoch secondes.
+    on_progress(report) reçoit un DuoReport provisoire après chaque match intégré.
+    Lève ValueError si le Riot ID est mal formé, AccountNotFound / NoGamesFound sinon.
+    """
+    api_key = api_key or os.environ.get("RIOT_API_KEY")
+    if "#" not in riot_id: raise ValueError("Format: Name#TAG")
+    parts = riot_id.split("#")
+    name_raw, tag = parts[0].strip(), parts[1].strip()
+    region = routing_region(region)
+    q_id = QUEUE_MAP.get(queue, queue) if isinstance(queue, str) else queue
+
+    def progress(acc):
+        with metrics.span("report"):
+            report = build_report(acc, riot_id, region, q_id, final=False)
+        on_progress(report)
+
+    scan = scan_sync if ASYNC_SCAN else scan_threads
+    # Trace du scan (réutilise celle de l'appelant s'il en a ouvert une, cf. app.py)
+    with metrics.tracing(riot_id=riot_id, region=region, queue=q_id, depth=depth or MATCH_COUNT, engine="async" if ASYNC_SCAN else "threads"):
+        acc = scan(quote(name_raw), tag, region, q_id, api_key, progress if on_progress else None, depth or MATCH_COUNT, start_time, end_time)
+        fingerprint = scan_fingerprint(acc, q_id)
+        report = REPORT_CACHE.get((riot_id, fingerprint))
+        metrics.incr("cache_hits_total" if report else "cache_misses_total", cache="report")
+        if report is None:
+            with metrics.span("report"):
+                report = build_report(acc, riot_id, region, q_id)
+            report.fingerprint = fingerprint
+            REPORT_CACHE.put((riot_id, fingerprint), report)
+        return report
+
+# --- PRECHARGEMENT DU DUO ---
+class PrefetchJob:
+    """Réchauffe en arrière-plan ce qu'il faut pour scanner le duo : puuid, compte, liste d'IDs, matchs absents.
+
+    Toutes les requêtes partent en PRIORITY_BACKGROUND et seulement si le budget de la région garde
+    PREFETCH_MIN_HEADROOM de marge ; cancel() arrête le job entre deux requêtes. Un job est partagé par
+    toutes les sessions qui ont trouvé ce duo : chacune le tient par un PrefetchHandle (cf. prefetch_duo).
+    """
+
+    def __init__(self, puuid, name, tag, region, q_id, api_key, depth):
+        self.puuid, self.name, self.tag = puuid, name, tag
+        self.region, self.q_id, self.api_key, self.depth = region, q_id, api_key, depth
+        self.cancelled = threading.Event()
+        self.users = 0  # Sessions qui en attendent le résultat (sous _prefetch_lock)
+        self.fetched = 0
+        self.thread = threading.Thread(target=self.run, daemon=True, name=f"prefetch-{puuid[:8]}")
+
+    @property
+    def done(self):
+        return not self.thread.is_alive()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def wait_budget(self):
+        """False si le job a été annulé pendant l'attente."""
+        while RATE_LIMITER.headroom(self.region) < PREFETCH_MIN_HEADROOM:
+            if self.cancelled.wait(PRIORITY_POLL * 10): return False
+        return not self.cancelled.is_set()
+
+    def run(self):
+        try:
+            with metrics.span("prefetch"):
+                self._run()
+        except Exception:
+            log.exception("Préchargement du duo interrompu (%s)", self.region)
+        finally:
+            with _prefetch_lock:
+                if _prefetch_jobs.get((self.puuid, self.q_id)) is self: del _prefetch_jobs[(self.puuid, self.q_id)]
+
+    def _run(self):
+        if not self.tag or self.tag == "None":
+            if not self.wait_budget(): return
+            account = get_account_by_puuid(self.puuid, self.region, self.api_key, priority=PRIORITY_BACKGROUND)
+            if not account: return
+            self.name, self.tag = account.get("gameName", self.name), account.get("tagLine")
+        # Le scan suivant partira du Riot ID affiché : son puuid est déjà connu, inutile de le redemander
+        get_puuid.prime(self.puuid, quote(self.name), self.tag, self.region, self.api_key)
+        if not self.wait_budget(): return
+        match_ids = list_match_ids(self.puuid, self.region, self.api_key, self.q_id, self.depth, priority=PRIORITY_BACKGROUND) or []
+        store = get_match_store()
+        for m_id in match_ids:
+            if store.get(m_id) is not None: continue  # Déjà là (souvent : les parties jouées ensemble)
+            if not self.wait_budget():
+                metrics.incr("prefetch_matches_total", result="cancelled")
+                return
+            fetch_match(m_id, self.region, self.api_key, PRIORITY_BACKGROUND)
+            self.fetched += 1
+            metrics.incr("prefetch_matches_total", result="fetched")
+
+class PrefetchHandle:
+    """Part d'une session dans un PrefetchJob partagé : cancel() ne l'arrête que si plus aucune session n'en a besoin."""
+
+    def __init__(self, job):
+        self.job = job
+        self.released = False
+
+    @property
+    def done(self):
+        return self.job.done
+
+    def cancel(self):
+        with _prefetch_lock:
+            if self.released: return
+            self.released = True
+            self.job.users -= 1
+            if self.job.users <= 0: self.job.cancel()
+
+_prefetch_jobs = {}  # (puuid, file) -> PrefetchJob en cours (un seul par duo, partagé entre sessions)
+_prefetch_lock = threading.Lock()
+
+def prefetch_duo(report, api_key=None, depth=MATCH_COUNT):
+    """Lance (ou rejoint) le préchargement du duo d'un DuoReport final. Renvoie le PrefetchHandle de l'appelant, ou None."""
+    if not PREFETCH or not report.has_duo or not report.duo_puuid: return None
+    key = (report.duo_puuid, report.queue)
+    with _prefetch_lock:
+        job = _prefetch_jobs.get(key)
+        if job is None or job.cancelled.is_set():
+            job = PrefetchJob(report.duo_puuid, report.duo_name, report.duo_tag, report.region, report.queue,
+                              api_key or os.environ.get("RIOT_API_KEY"), depth)
+            _prefetch_jobs[key] = job
+            job.thread.start()
+        job.users += 1
+    return PrefetchHandle(job)
+
+# --- SCAN D'EQUIPE (ROSTER) ---
+class PairGraph:
+    """Qui joue avec qui : parties et victoires par paire de coéquipiers, dès qu'un des deux est dans le roster.
+
+    Alimenté match par match (aucun payload gardé) ; clé = paire de puuids triée.
+    """
+
+    def __init__(self, roster):
+        self.roster = set(roster)
+        self.names = {}  # puuid -> Riot ID lu dans les matchs
+        self.pairs = {}  # (puuid, puuid) -> [parties, victoires]
+        self.seen = set()
+
+    def add(self, record):
+        if record is None or record.duration < 300 or record.match_id in self.seen: return
+        self.seen.add(record.match_id)
+        teams = {}
+        for p in record.participants:
+            if p.tag: self.names.setdefault(p.puuid, f"{p.name}#{p.tag}")
+            teams.setdefault(p.team, []).append(p)
+        for team in teams.values():
+            if not any(p.puuid in self.roster for p in team): continue
+            for i, a in enumerate(team):
+                for b in team[i + 1:]:
+                    if a.puuid not in self.roster and b.puuid not in self.roster: continue
+                    pair = self.pairs.setdefault(tuple(sorted((a.puuid, b.puuid))), [0, 0])
+                    pair[0] += 1
+                    pair[1] += bool(a.win)
+
+    def edges(self, min_games=2):
+        """Paires d'au moins min_games parties ensemble, de la plus fréquente à la moins fréquente."""
+        out = []
+        for (a, b), (g, w) in sorted(self.pairs.items(), key=lambda kv: -kv[1][0]):
+            if g < min_games: break
+            out.append({"a": self.names.get(a, a), "b": self.names.get(b, b), "a_puuid": a, "b_puuid": b,
+                        "games": g, "wins": w, "winrate": int(w / g * 100), "roster": a in self.roster and b in self.roster})
+        return out
+
+@dataclass
+class RosterReport:
+    """Résultat d'un scan d'équipe : un DuoReport par membre + graphe des paires."""
+    queue: int
+    members: list = field(default_factory=list)  # {riot_id, region, puuid, matches, error, report}
+    pairs: list = field(default_factory=list)    # cf. PairGraph.edges
+    matches_listed: int = 0   # Somme des historiques des membres
+    matches_fetched: int = 0  # Matchs uniques réellement lus (API ou cache)
+
+    def to_dict(self):
+        return asdict(self)
+
+def parse_player(entry, default_region):
+    """'Name#TAG' ou 'Name#TAG,KR' -> (riot_id, plateforme)."""
+    riot_id, _, region = entry.partition(",")
+    return riot_id.strip(), (region.strip() or default_region)
+
+def scan_roster(players, queue, api_key=None, depth=None, min_games=2):
+    """Analyse un roster (ou une liste de suspects) d'un coup : players = [(riot_id, plateforme)].
+
+    Chaque match n'est lu qu'une fois même s'il est dans l'historique de plusieurs membres, puis
+    distribué aux DuoAccumulator concernés et au PairGraph. Les régions de routage sont scannées en
+    parallèle (le rate limiter est par région, elles ne se ralentissent pas entre elles).
+    """
+    api_key = api_key or os.environ.get("RIOT_API_KEY")
+    depth = depth or MATCH_COUNT
+    q_id = QUEUE_MAP.get(queue, queue) if isinstance(queue, str) else queue
+
+    def resolve(player):
+        riot_id, platform = player
+        member = {"riot_id": riot_id, "region": routing_region(platform), "puuid": None, "matches": 0, "error": None, "report": None}
+        if "#" not in riot_id:
+            member["error"] = "ValueError"
+            return member, []
+        name, tag = (x.strip() for x in riot_id.split("#", 1))
+        member["puuid"] = get_puuid(quote(name), tag, member["region"], api_key)
+        if not member["puuid"]:
+            member["error"] = "AccountNotFound"
+            return member, []
+        ids = list_match_ids(member["puuid"], member["region"], api_key, q_id, depth) or []
+        if not ids: member["error"] = "NoGamesFound"
+        member["matches"] = len(ids)
+        return member, ids
+
+    with metrics.tracing(roster=len(players), queue=q_id, depth=depth):
+        with metrics.span("match_ids"), concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            resolved = [f.result() for f in [executor.submit(contextvars.copy_context().run, resolve, p) for p in players]]
+        members = [m for m, _ in resolved]
+        accs = [DuoAccumulator(m["puuid"], len(ids), depth) if m["puuid"] else None for m, ids in resolved]
+        owners = {}  # (région, match ID) -> index des membres qui l'ont dans leur historique
+        for i, (m, ids) in enumerate(resolved):
+            for m_id in ids: owners.setdefault((m["region"], m_id), []).append(i)
+        graph = PairGraph(m["puuid"] for m in members if m["puuid"])
+
+        # Une file par région, chacune avec la fenêtre concurrency(region) de sa région : une région throttlée
+        # ne ralentit pas les autres
+        queues = {}
+        for region, m_id in owners: queues.setdefault(region, deque()).append(m_id)
+        futures = {}  # future -> (région, match ID)
+        fetched = 0
+        stats = ConcurrencyStats()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=(MAX_CONCURRENCY if ADAPTIVE_CONCURRENCY else MAX_WORKERS) * max(1, len(queues))) as executor:
+            def refill():
+                for region, queue_ids in queues.items():
+                    limit = concurrency(region)
+                    stats.record(region, limit)
+                    running = sum(1 for r, _ in futures.values() if r == region)
+                    while queue_ids and running < limit:
+                        m_id = queue_ids.popleft()
+                        futures[executor.submit(contextvars.copy_context().run, fetch_match, m_id, region, api_key)] = (region, m_id)
+                        running += 1
+
+            refill()
+            while futures:
+                done, _ = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    key = futures.pop(future)
+                    try:
+                        data = future.result()
+                    except Exception:
+                        log.exception("Match ignoré (%s)", key[0])
+                        continue
+                    if data is not None: fetched += 1
+                    with metrics.span("aggregate"):
+                        graph.add(data)
+                        for i in owners[key]: accs[i].add(data)
+                refill()
+        stats.publish()
+
+        with metrics.span("report"):
+            for m, acc in zip(members, accs):
+                if acc is None or m["error"]: continue
+                resolve_duo_account(acc, m["region"], api_key)
+                m["report"] = build_report(acc, m["riot_id"], m["region"], q_id)
+                m["report"].fingerprint = scan_fingerprint(acc, q_id)
+                graph.names.setdefault(m["puuid"], m["riot_id"])
+    return RosterReport(queue=q_id, members=members, pairs=graph.edges(min_games),
+                        matches_listed=sum(len(ids) for _, ids in resolved), matches_fetched=fetched)
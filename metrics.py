@@ -0,0 +1,189 @@
+"""Instrumentation du moteur : spans (durées par étape), compteurs (requêtes, 429, retries, cache, attente) et jauges.
+
+Deux niveaux :
+  - registre global du process, exposé au format texte Prometheus (serve(), METRICS_PORT) ;
+  - Trace par scan (contextvar), affichée dans le panneau debug et écrite en une ligne JSON
+    dans le logger "boostlol.scan" (fichier METRICS_LOG si défini).
+
+Les threads de l'executor ne reçoivent pas le contexte tout seuls : les soumettre via
+contextvars.copy_context().run (asyncio.to_thread et les tâches asyncio le copient déjà).
+"""
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT = os.environ.get("METRICS_PORT")
+METRICS_LOG = os.environ.get("METRICS_LOG")
+
+scan_log = logging.getLogger("boostlol.scan")
+
+class Registry:
+    """Compteurs et résumés de durées, clés = (nom, labels triés)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.spans = {}  # (nom, labels) -> [count, somme s, max s]
+        self.gauges = {}  # (nom, labels) -> dernière valeur
+
+    def incr(self, name, value=1, labels=()):
+        with self.lock:
+            self.counters[(name, labels)] = self.counters.get((name, labels), 0) + value
+
+    def observe(self, name, seconds, labels=()):
+        with self.lock:
+            s = self.spans.setdefault((name, labels), [0, 0.0, 0.0])
+            s[0] += 1
+            s[1] += seconds
+            s[2] = max(s[2], seconds)
+
+    def set_gauge(self, name, value, labels=()):
+        with self.lock:
+            self.gauges[(name, labels)] = value
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counters), {k: list(v) for k, v in self.spans.items()}
+
+class Trace(Registry):
+    """Mesures d'un seul scan (même structure que le registre global)."""
+
+    def __init__(self, fields):
+        super().__init__()
+        self.fields = fields
+        self.started = time.perf_counter()
+        self.wall = None
+
+    def to_dict(self):
+        counters, spans = self.snapshot()
+        return {**self.fields,
+                "wall_s": round(self.wall if self.wall is not None else time.perf_counter() - self.started, 4),
+                "spans": {_flat(n, l): {"count": c, "total_s": round(t, 4), "max_s": round(m, 4)} for (n, l), (c, t, m) in sorted(spans.items())},
+                "counters": {_flat(n, l): v for (n, l), v in sorted(counters.items())}}
+
+REGISTRY = Registry()
+_current = contextvars.ContextVar("boostlol_trace", default=None)
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _flat(name, labels):
+    return name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else "")
+
+# --- API ---
+def incr(name, value=1, **labels):
+    key = _labels(labels)
+    REGISTRY.incr(name, value, key)
+    trace = _current.get()
+    if trace: trace.incr(name, value, key)
+
+def gauge(name, value, **labels):
+    """Valeur instantanée (ex. fenêtre de concurrence d'une région), registre global uniquement."""
+    REGISTRY.set_gauge(name, value, _labels(labels))
+
+def annotate(**fields):
+    """Ajoute des champs au résumé de la Trace en cours (sans effet hors tracing())."""
+    trace = _current.get()
+    if trace: trace.fields.update(fields)
+
+def observe(name, seconds, **labels):
+    key = _labels(labels)
+    REGISTRY.observe(name, seconds, key)
+    trace = _current.get()
+    if trace: trace.observe(name, seconds, key)
+
+@contextlib.contextmanager
+def span(name, **labels):
+    """Chronomètre un bloc : `with metrics.span("fetch_match"): ...`"""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t0, **labels)
+
+@contextlib.contextmanager
+def tracing(**fields):
+    """Ouvre une Trace pour le bloc (ou réutilise celle déjà ouverte : app.py englobe analyze + rendu).
+
+    A la fermeture de la Trace la plus externe, le résumé part en JSON dans le logger boostlol.scan.
+    """
+    trace = _current.get()
+    if trace is not None:
+        trace.fields.update({k: v for k, v in fields.items() if k not in trace.fields})
+        yield trace
+        return
+    trace = Trace(dict(fields))
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+        trace.wall = time.perf_counter() - trace.started
+        observe("scan", trace.wall)
+        scan_log.info(json.dumps(trace.to_dict(), default=str))
+
+# --- SINKS ---
+def prometheus_text():
+    """Registre global au format d'exposition texte Prometheus (compteurs *_total, spans en summary)."""
+    counters, spans = REGISTRY.snapshot()
+    lines = []
+    def fmt(name, labels, value):
+        lab = "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}" if labels else ""
+        lines.append(f"boostlol_{name}{lab} {value}")
+    for name in sorted({n for n, _ in counters}):
+        lines.append(f"# TYPE boostlol_{name} counter")
+        for (n, l), v in sorted(counters.items()):
+            if n == name: fmt(n, l, v)
+    with REGISTRY.lock:
+        gauges = dict(REGISTRY.gauges)
+    for name in sorted({n for n, _ in gauges}):
+        lines.append(f"# TYPE boostlol_{name} gauge")
+        for (n, l), v in sorted(gauges.items()):
+            if n == name: fmt(n, l, v)
+    lines.append("# TYPE boostlol_span_seconds summary")
+    for (n, l), (c, t, m) in sorted(spans.items()):
+        fmt("span_seconds_count", (("span", n),) + l, c)
+        fmt("span_seconds_sum", (("span", n),) + l, round(t, 6))
+        fmt("span_seconds_max", (("span", n),) + l, round(m, 6))
+    return "\n".join(lines) + "\n"
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+_server = None
+_server_lock = threading.Lock()
+
+def serve(port=None):
+    """Démarre (une seule fois par process) l'endpoint /metrics ; port=None -> METRICS_PORT, rien si absent."""
+    global _server
+    port = port or METRICS_PORT
+    if not port: return None
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer(("0.0.0.0", int(port)), _Handler)
+            threading.Thread(target=_server.serve_forever, daemon=True, name="metrics").start()
+        return _server
+
+if METRICS_LOG and not scan_log.handlers:
+    _handler = logging.FileHandler(METRICS_LOG, encoding="utf-8")
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    scan_log.addHandler(_handler)
+    scan_log.setLevel(logging.INFO)
+    scan_log.propagate = False